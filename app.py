@@ -11,8 +11,8 @@ import logging
 import time
 import json
 import base64
-from datetime import datetime
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, make_response, Response
+from datetime import datetime, timezone
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, make_response, Response, session, abort, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_wtf import FlaskForm
 from werkzeug.utils import secure_filename
@@ -23,6 +23,23 @@ from io import BytesIO
 # Import models and forms
 from models import db, Event, Participant, Certificate, Quiz, QuizQuestion, QuizParticipant, QuizAnswer
 from forms import EventForm, ParticipantUploadForm, ManualParticipantForm, EditParticipantForm, CertificateForm, AttendanceForm, QuizForm, QuizQuestionUploadForm, QuizJoinForm
+from participant_import import detect_participant_columns, import_participants, is_xlsx_filename, read_participant_file, validate_participant_rows
+from ticketing import TicketCounter, reserve_ticket_numbers
+from import_jobs import ImportJob, create_import_job, resume_import_jobs, start_import_thread
+from csv_stream import iter_csv_lines
+from event_stats import EventCounter, get_event_counters, seed_event_counters
+from participant_queries import DEFAULT_PAGE_SIZE, ensure_participant_indexes, event_participants, list_participants, parse_bool, participant_to_dict, participants_by_ids
+from query_guard import init_query_guard
+from fragment_cache import dashboard_cache
+from live_feed import counters_payload, stream_event_feed
+from participant_search import ensure_search_index, search_participants
+from ticket_cache import ticket_cache
+from exports import EXPORT_FORMATS, REPORT_FORMATS, event_report_rows
+from mailer import BatchMailer, init_rate_limiter, send_rate_limiter
+from email_outbox import (EMAIL_KIND_CERTIFICATE, EMAIL_KIND_TICKET, EmailOutbox, UndeliverableEmail, enqueue_emails,
+                          next_outbox_wakeup, outbox_status, start_outbox_thread)
+from checkin import (MAX_SYNC_BATCH, SCAN_OK, export_ticket_set, normalize_ticket_number, scan_checkin,
+                     sync_offline_scans, toggle_participant_checkin)
 
 def allowed_file(filename):
     """Check if file has an allowed extension"""
@@ -54,6 +71,14 @@ from werkzeug.utils import secure_filename
 import pandas as pd
 from dotenv import load_dotenv
 
+class ParticipantFileUploadForm(ParticipantUploadForm):
+    """Participant upload form accepting CSV files and Excel workbooks."""
+    csv_file = FileField('Participants File (CSV or Excel)', validators=[
+        FileRequired(),
+        FileAllowed(['csv', 'xlsx'], 'CSV or Excel (.xlsx) files only!')
+    ])
+    dry_run = BooleanField('Validate only (dry run), download error report')
+
 # Load environment variables
 load_dotenv()
 
@@ -76,7 +101,17 @@ app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-here')
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///event_ticketing.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['UPLOAD_FOLDER'] = 'uploads'
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_CONTENT_LENGTH', 64 * 1024 * 1024))  # 64MB max file size
+
+# Participant uploads larger than this are imported by a background job
+app.config['IMPORT_JOB_THRESHOLD'] = int(os.getenv('IMPORT_JOB_THRESHOLD', 1024 * 1024))  # 1MB
+# Run queued import jobs in a thread of the web process (disable when using import_worker.py)
+app.config['IMPORT_JOBS_RUN_IN_THREAD'] = os.getenv('IMPORT_JOBS_RUN_IN_THREAD', 'True').lower() == 'true'
+# Send queued emails from a thread of the web process (disable when using email_worker.py)
+app.config['EMAIL_OUTBOX_RUN_IN_THREAD'] = os.getenv('EMAIL_OUTBOX_RUN_IN_THREAD', 'True').lower() == 'true'
+
+# Rendered dashboards are reused for unchanged events within this window
+app.config['DASHBOARD_CACHE_SECONDS'] = int(os.getenv('DASHBOARD_CACHE_SECONDS', 30 * 60))
 
 # DEBUG: Print database configuration
 db_uri = app.config['SQLALCHEMY_DATABASE_URI']
@@ -101,14 +136,29 @@ app.config['MAIL_USE_SSL'] = os.getenv('MAIL_USE_SSL', 'False').lower() == 'true
 app.config['MAIL_USERNAME'] = os.getenv('MAIL_USERNAME')
 app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD')
 app.config['MAIL_DEFAULT_SENDER'] = os.getenv('MAIL_DEFAULT_SENDER')
+# Outgoing email rate in messages per second per process; it is lowered on
+# 421 and quota replies and raised again after successful sends
+app.config['MAIL_SEND_RATE'] = float(os.getenv('MAIL_SEND_RATE', 5))
+app.config['MAIL_SEND_MIN_RATE'] = float(os.getenv('MAIL_SEND_MIN_RATE', 0.2))
+app.config['MAIL_SEND_MAX_RATE'] = float(os.getenv('MAIL_SEND_MAX_RATE', 20))
+app.config['MAIL_SEND_BURST'] = int(os.getenv('MAIL_SEND_BURST', 5))
+# SMTP connections the outbox worker sends over in parallel
+app.config['MAIL_SEND_CONNECTIONS'] = int(os.getenv('MAIL_SEND_CONNECTIONS', 4))
 
 # Initialize extensions
 db.init_app(app)
 mail = Mail(app)
+init_rate_limiter(app)
+
+# Fail requests with N+1 query patterns while testing
+init_query_guard(app)
 
 # Create database tables
 with app.app_context():
     db.create_all()
+    ensure_participant_indexes()
+    ensure_search_index()
+    seed_event_counters()
 
 @app.route('/')
 def index():
@@ -158,116 +208,63 @@ def create_event():
 
 @app.route('/upload_participants/<int:event_id>', methods=['GET', 'POST'])
 def upload_participants(event_id):
-    """Upload participants CSV for an event."""
+    """Upload participants CSV or Excel file for an event."""
     event = Event.query.get_or_404(event_id)
-    form = ParticipantUploadForm()
+    form = ParticipantFileUploadForm()
     
     if form.validate_on_submit():
         file = form.csv_file.data
         filename = secure_filename(file.filename)
         
         try:
-            # Read CSV directly from memory with BOM handling
-            file_content = file.stream.read()
-            
-            # Handle BOM (Byte Order Mark) that Excel and other editors add
-            if file_content.startswith(b'\xef\xbb\xbf'):
-                # UTF-8 BOM detected, remove it
-                file_content = file_content[3:]
-                logger.info("Removed UTF-8 BOM from CSV file")
-            elif file_content.startswith(b'\xff\xfe'):
-                # UTF-16 LE BOM detected
-                file_content = file_content[2:]
-                logger.info("Removed UTF-16 LE BOM from CSV file")
-            elif file_content.startswith(b'\xfe\xff'):
-                # UTF-16 BE BOM detected
-                file_content = file_content[2:]
-                logger.info("Removed UTF-16 BE BOM from CSV file")
-            
-            # Decode to string
-            try:
-                content_str = file_content.decode('utf-8')
-            except UnicodeDecodeError:
-                # Fallback to other encodings
-                try:
-                    content_str = file_content.decode('utf-16')
-                except UnicodeDecodeError:
-                    content_str = file_content.decode('iso-8859-1')
-            
-            stream = io.StringIO(content_str, newline=None)
-            csv_input = csv.DictReader(stream)
-            
-            # Clean fieldnames to remove any remaining invisible characters
-            if csv_input.fieldnames:
-                cleaned_fieldnames = []
-                for field in csv_input.fieldnames:
-                    # Remove BOM and other invisible characters
-                    cleaned_field = field.strip().lstrip('\ufeff').strip()
-                    cleaned_fieldnames.append(cleaned_field)
-                csv_input.fieldnames = cleaned_fieldnames
+            # Hand large files to a background import job instead of parsing them in the request
+            file.stream.seek(0, os.SEEK_END)
+            file_size = file.stream.tell()
+            file.stream.seek(0)
             
-            # Debug: Check what columns are detected
-            fieldnames = csv_input.fieldnames
-            logger.info(f"CSV columns detected (after cleaning): {fieldnames}")
+            if file_size > app.config['IMPORT_JOB_THRESHOLD'] and not form.dry_run.data:
+                job = create_import_job(event, file)
+                if app.config['IMPORT_JOBS_RUN_IN_THREAD']:
+                    start_import_thread(app, job.id)
+                
+                flash(f'Large file queued for background import (job #{job.id}). Participants will appear as chunks are committed.', 'info')
+                return redirect(url_for('event_dashboard', event_id=event_id))
             
-            # Map common column variations to our expected names (with BOM-cleaned versions)
-            name_columns = ['name', 'Name', 'NAME', 'participant_name', 'Participant Name', 'full_name', 'Full Name', '﻿name']
-            email_columns = ['email', 'Email', 'EMAIL', 'email_address', 'Email Address', 'e-mail', 'E-mail']
+            # Decode CSV incrementally, or stream .xlsx rows in openpyxl read-only mode
+            file_type = 'Excel' if is_xlsx_filename(filename) else 'CSV'
+            reader = read_participant_file(file.stream, filename)
             
-            # Find which column contains name and email
-            name_col = None
-            email_col = None
+            # Debug: Check what columns are detected
+            fieldnames = reader.fieldnames or []
+            logger.info(f"{file_type} columns detected (after cleaning): {fieldnames}")
             
-            for col in fieldnames:
-                col_clean = col.strip().lstrip('\ufeff').strip()  # Extra BOM cleaning
-                if col_clean in name_columns or col in name_columns:
-                    name_col = col
-                if col_clean in email_columns or col in email_columns:
-                    email_col = col
+            # Find which column contains name and email
+            name_col, email_col = detect_participant_columns(fieldnames)
             
             if not name_col or not email_col:
-                flash(f'CSV format error. Expected columns: name, email. Found columns: {", ".join(fieldnames)}', 'error')
+                flash(f'{file_type} format error. Expected columns: name, email. Found columns: {", ".join(fieldnames)}', 'error')
                 return redirect(url_for('upload_participants', event_id=event_id))
             
-            participants_added = 0
-            errors = []
+            # Dry run: validate the whole file and return every rejected row without importing
+            if form.dry_run.data:
+                total_rows, report = validate_participant_rows(event, reader, name_col, email_col)
+                
+                if report.empty:
+                    flash(f'Dry run passed: all {total_rows} rows are valid and ready to import.', 'success')
+                    return redirect(url_for('upload_participants', event_id=event_id))
+                
+                output = io.StringIO()
+                report.to_csv(output, index=False)
+                
+                response = make_response(output.getvalue())
+                response.headers['Content-Type'] = 'text/csv'
+                response.headers['Content-Disposition'] = f'attachment; filename={event.name}_import_errors.csv'
+                response.headers['X-Rows-Total'] = str(total_rows)
+                response.headers['X-Rows-Rejected'] = str(len(report))
+                return response
             
-            for row_num, row in enumerate(csv_input, start=2):
-                try:
-                    # Extract data from CSV row using detected column names
-                    name = row.get(name_col, '').strip()
-                    email = row.get(email_col, '').strip()
-                    
-                    if not name or not email:
-                        errors.append(f"Row {row_num}: Missing name or email")
-                        continue
-                    
-                    # Check if participant already exists for this event
-                    existing = Participant.query.filter_by(
-                        event_id=event_id,
-                        email=email
-                    ).first()
-                    
-                    if existing:
-                        errors.append(f"Row {row_num}: Email {email} already registered")
-                        continue
-                    
-                    # Generate ticket number using event format
-                    ticket_number = event.generate_next_ticket_number()
-                    
-                    # Create participant
-                    participant = Participant(
-                        event_id=event_id,
-                        name=name,
-                        email=email,
-                        ticket_number=ticket_number
-                    )
-                    
-                    db.session.add(participant)
-                    participants_added += 1
-                    
-                except Exception as e:
-                    errors.append(f"Row {row_num}: {str(e)}")
+            # Validate against existing emails in one query and write rows with bulk inserts
+            participants_added, errors = import_participants(event, reader, name_col, email_col)
             
             db.session.commit()
             
@@ -281,48 +278,147 @@ def upload_participants(event_id):
             return redirect(url_for('event_dashboard', event_id=event_id))
             
         except Exception as e:
-            flash(f'Error processing CSV: {str(e)}', 'error')
+            db.session.rollback()
+            flash(f'Error processing file: {str(e)}', 'error')
     
     return render_template('upload_participants.html', form=form, event=event)
 
+@app.route('/event/<int:event_id>/import_jobs/<int:job_id>')
+def import_job_status(event_id, job_id):
+    """Return progress of a background participant import job."""
+    job = ImportJob.query.filter_by(id=job_id, event_id=event_id).first_or_404()
+    
+    # A job whose process restarted resumes from its last committed chunk; claiming is atomic
+    if app.config['IMPORT_JOBS_RUN_IN_THREAD'] and job.claimable:
+        start_import_thread(app, job.id)
+    
+    return jsonify(job.to_dict())
+
 @app.route('/event/<int:event_id>/dashboard')
 def event_dashboard(event_id):
-    """Event dashboard showing all participants and attendance."""
+    """Event dashboard showing attendance and the first page of participants."""
     event = Event.query.get_or_404(event_id)
-    participants = Participant.query.filter_by(event_id=event_id).all()
-    
-    # Calculate statistics
-    total_participants = len(participants)
-    checked_in = sum(1 for p in participants if p.checked_in)
-    
-    # Email statistics
-    emails_sent = sum(1 for p in participants if p.email_sent)
-    pending_emails = total_participants - emails_sent
-    
-    # Calculate certificate statistics
-    certificates_issued = sum(1 for p in participants if p.has_certificate)
-    certificates_sent = sum(1 for p in participants if p.has_certificate and p.certificate.email_sent)
-    eligible_for_certificates = sum(1 for p in participants if p.checked_in and not p.has_certificate)
-    
-    # Certificate configuration status
-    certificate_config_status = {
-        'configured': event.has_certificate_config,
-        'last_updated': event.certificate_config_updated,
-        'organizer_name': event.organizer_name,
-        'certificate_type': event.certificate_type
-    }
     
-    return render_template('event_dashboard.html', 
-                         event=event, 
-                         participants=participants,
-                         total_participants=total_participants,
-                         checked_in=checked_in,
-                         emails_sent=emails_sent,
-                         pending_emails=pending_emails,
-                         certificates_issued=certificates_issued,
-                         certificates_sent=certificates_sent,
-                         eligible_for_certificates=eligible_for_certificates,
-                         certificate_config_status=certificate_config_status)
+    # Statistics and the version stamp come from the incrementally maintained counters row
+    stats = get_event_counters(event_id)
+    
+    # Rendered pages embed CSRF tokens, so cached copies expire with a time bucket
+    bucket_seconds = app.config['DASHBOARD_CACHE_SECONDS']
+    version = (stats['version'], int(time.time() // bucket_seconds))
+    etag = f"event-{event_id}-v{version[0]}-{version[1]}"
+    # Last-Modified moves with the bucket too, so If-Modified-Since cannot revalidate a stale token
+    last_modified = datetime.fromtimestamp(version[1] * bucket_seconds, timezone.utc)
+    if stats['updated_at']:
+        last_modified = max(last_modified, stats['updated_at'].replace(tzinfo=timezone.utc, microsecond=0))
+    
+    # Pages carrying flash messages are one-off renders
+    cacheable = not session.get('_flashes')
+    if cacheable:
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains(etag)
+        else:
+            not_modified = bool(request.if_modified_since and last_modified <= request.if_modified_since)
+        if not_modified:
+            response = make_response('', 304)
+            response.set_etag(etag)
+            return response
+    
+    cache_key = (event_id, session.get('csrf_token'))
+    body = dashboard_cache.get(cache_key, version) if cacheable else None
+    
+    if body is None:
+        # Only the first page is rendered; the page fetches the rest from
+        # event_participants_api with next_cursor, and exports load the full list
+        page = list_participants(event_id)
+        
+        # Certificate configuration status
+        certificate_config_status = {
+            'configured': event.has_certificate_config,
+            'last_updated': event.certificate_config_updated,
+            'organizer_name': event.organizer_name,
+            'certificate_type': event.certificate_type
+        }
+        
+        body = render_template('event_dashboard.html', 
+                             event=event, 
+                             participants=page['participants'],
+                             next_cursor=page['next_cursor'],
+                             has_more=page['has_more'],
+                             total_participants=stats['total_participants'],
+                             checked_in=stats['checked_in'],
+                             emails_sent=stats['emails_sent'],
+                             pending_emails=stats['pending_emails'],
+                             certificates_issued=stats['certificates_issued'],
+                             certificates_sent=stats['certificates_sent'],
+                             eligible_for_certificates=stats['eligible_for_certificates'],
+                             certificate_config_status=certificate_config_status)
+        
+        if cacheable:
+            # Rendering may have created the session's CSRF token
+            dashboard_cache.set((event_id, session.get('csrf_token')), version, body)
+    
+    response = make_response(body)
+    if cacheable:
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@app.route('/event/<int:event_id>/participants/search')
+def search_event_participants(event_id):
+    """Ranked fuzzy search over participant name, email and ticket number."""
+    Event.query.get_or_404(event_id)
+    
+    query = request.args.get('q', '')
+    limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+    
+    results = []
+    for participant, score in search_participants(event_id, query, limit=limit):
+        result = participant_to_dict(participant)
+        result['score'] = score
+        results.append(result)
+    
+    return jsonify({'query': query, 'results': results})
+
+@app.route('/event/<int:event_id>/live')
+def event_live_feed(event_id):
+    """Server-Sent Events stream of check-in deltas and counters for the dashboard."""
+    Event.query.get_or_404(event_id)
+    initial_counters = counters_payload(get_event_counters(event_id))
+    
+    # The stream polls on its own short-lived connections, so release the database session now
+    engine = db.engine
+    db.session.remove()
+    
+    response = Response(stream_event_feed(event_id, initial_counters, engine), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Disable proxy buffering (nginx)
+    return response
+
+@app.route('/event/<int:event_id>/participants')
+def event_participants_api(event_id):
+    """JSON participant list with keyset pagination, filters and sorting."""
+    Event.query.get_or_404(event_id)
+    
+    try:
+        page = list_participants(
+            event_id,
+            search=request.args.get('q'),
+            checked_in=parse_bool(request.args.get('checked_in')),
+            email_sent=parse_bool(request.args.get('email_sent')),
+            sort=request.args.get('sort', 'id'),
+            direction=request.args.get('direction', 'asc'),
+            cursor=request.args.get('cursor'),
+            limit=request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'participants': [participant_to_dict(p) for p in page['participants']],
+        'next_cursor': page['next_cursor'],
+        'has_more': page['has_more']
+    })
 
 @app.route('/event/<int:event_id>/delete', methods=['POST'])
 def delete_event(event_id):
@@ -340,6 +436,12 @@ def delete_event(event_id):
         if participant_ids:
             Certificate.query.filter(Certificate.participant_id.in_(participant_ids)).delete(synchronize_session=False)
         
+        # Remove the event's ticket counter, statistics counters, import jobs and queued emails
+        TicketCounter.query.filter_by(event_id=event_id).delete(synchronize_session=False)
+        EventCounter.query.filter_by(event_id=event_id).delete(synchronize_session=False)
+        ImportJob.query.filter_by(event_id=event_id).delete(synchronize_session=False)
+        EmailOutbox.query.filter_by(event_id=event_id).delete(synchronize_session=False)
+        
         # Now delete the event (participants will be deleted automatically due to cascade)
         db.session.delete(event)
         db.session.commit()
@@ -358,60 +460,132 @@ def delete_event(event_id):
 @app.route('/participant/<int:participant_id>/checkin', methods=['POST'])
 def toggle_checkin(participant_id):
     """Toggle participant check-in status."""
-    participant = Participant.query.get_or_404(participant_id)
-    participant.checked_in = not participant.checked_in
-    participant.checkin_time = datetime.now() if participant.checked_in else None
+    result = toggle_participant_checkin(participant_id)
+    if result is None:
+        abort(404)
     db.session.commit()
     
-    status = 'checked in' if participant.checked_in else 'checked out'
+    status = 'checked in' if result['checked_in'] else 'checked out'
     
     # Check if this is a form submission that should redirect
     if request.form.get('redirect') == 'true':
-        flash(f'{participant.name} {status}', 'success')
-        return redirect(url_for('event_dashboard', event_id=participant.event_id))
+        flash(f'{result["name"]} {status}', 'success')
+        return redirect(url_for('event_dashboard', event_id=result['event_id']))
     
     # Otherwise return JSON for AJAX calls
     return jsonify({
         'success': True,
-        'message': f'{participant.name} {status}',
-        'checked_in': participant.checked_in
+        'message': f'{result["name"]} {status}',
+        'checked_in': result['checked_in'],
+        'previous_checked_in': result['previous_checked_in'],
+        'checkin_time': result['checkin_time'].isoformat() if result['checkin_time'] else None
     })
 
+@app.route('/event/<int:event_id>/scan', methods=['POST'])
+def scan_ticket(event_id):
+    """Idempotent check-in from a scanned ticket QR code."""
+    data = request.get_json(silent=True) or request.form
+    ticket_number = normalize_ticket_number(data.get('ticket_number'))
+    
+    try:
+        status, participant = scan_checkin(event_id, ticket_number)
+        if status == SCAN_OK:
+            db.session.commit()
+        else:
+            db.session.rollback()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Scan check-in failed for ticket {ticket_number}: {str(e)}")
+        return jsonify({'status': 'error', 'message': 'Check-in failed, please scan again'}), 500
+    
+    return jsonify({'status': status, 'ticket_number': ticket_number, 'participant': participant})
+
+@app.route('/event/<int:event_id>/scan/sync', methods=['POST'])
+def sync_scans(event_id):
+    """Apply check-ins recorded by scanners while they were offline."""
+    Event.query.get_or_404(event_id)
+    
+    data = request.get_json(silent=True) or {}
+    records = data.get('scans')
+    if not isinstance(records, list):
+        return jsonify({'error': 'Expected a JSON body with a "scans" list'}), 400
+    if len(records) > MAX_SYNC_BATCH:
+        return jsonify({'error': f'At most {MAX_SYNC_BATCH} scans per sync'}), 413
+    
+    try:
+        results = sync_offline_scans(event_id, records)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Offline scan sync failed for event {event_id}: {str(e)}")
+        return jsonify({'error': 'Sync failed, nothing was applied. Please retry.'}), 500
+    
+    return jsonify({'results': results})
+
+@app.route('/event/<int:event_id>/tickets')
+def export_tickets(event_id):
+    """Compact ticket set of an event for scanners validating offline."""
+    Event.query.get_or_404(event_id)
+    
+    # Scanners re-download only when the event changed
+    version = get_event_counters(event_id)['version']
+    etag = f"tickets-{event_id}-v{version}"
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+        response.set_etag(etag)
+        return response
+    
+    ticket_set = export_ticket_set(event_id, include_names=request.args.get('names') == '1')
+    ticket_set['version'] = version
+    ticket_set['generated_at'] = datetime.now().isoformat()
+    
+    response = jsonify(ticket_set)
+    response.set_etag(etag)
+    return response
+
 @app.route('/event/<int:event_id>/export')
 def export_attendance(event_id):
-    """Export attendance report as CSV."""
+    """Export attendance report as CSV, XLSX or JSON Lines, streamed from a server-side cursor."""
     event = Event.query.get_or_404(event_id)
-    participants = Participant.query.filter_by(event_id=event_id).all()
-    
-    output = io.StringIO()
-    writer = csv.writer(output)
+    export_format = request.args.get('format', 'csv').lower()
     
-    # Write header
-    writer.writerow(['Name', 'Email', 'Ticket Number', 'Checked In', 'Check-in Time'])
+    if export_format not in EXPORT_FORMATS:
+        flash(f'Unsupported export format: {export_format}', 'warning')
+        return redirect(url_for('event_dashboard', event_id=event_id))
     
-    # Write participant data
-    for participant in participants:
-        checkin_time = participant.checkin_time.strftime('%Y-%m-%d %H:%M:%S') if participant.checkin_time else ''
-        writer.writerow([
-            participant.name,
-            participant.email,
-            participant.ticket_number,
-            'Yes' if participant.checked_in else 'No',
-            checkin_time
-        ])
+    stream_export, mimetype = EXPORT_FORMATS[export_format]
+    response = Response(stream_with_context(stream_export(event_id)), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename={event.name}_attendance.{export_format}'
     
-    output.seek(0)
+    return response
+
+@app.route('/reports/events')
+def events_report():
+    """Consolidated per-event report for a set of events or a date range, as CSV or JSON."""
+    report_format = request.args.get('format', 'csv').lower()
+    if report_format not in REPORT_FORMATS:
+        return jsonify({'error': f'Unsupported report format: {report_format}'}), 400
     
-    response = make_response(output.getvalue())
-    response.headers['Content-Type'] = 'text/csv'
-    response.headers['Content-Disposition'] = f'attachment; filename={event.name}_attendance.csv'
+    try:
+        # event_id may be repeated or comma-separated
+        event_ids = [int(value) for arg in request.args.getlist('event_id') for value in arg.split(',') if value.strip()]
+        start_date = datetime.strptime(request.args['start'], '%Y-%m-%d').date() if request.args.get('start') else None
+        end_date = datetime.strptime(request.args['end'], '%Y-%m-%d').date() if request.args.get('end') else None
+    except ValueError:
+        return jsonify({'error': 'event_id must be integers and start/end dates in YYYY-MM-DD format'}), 400
+    
+    stream_report, mimetype = REPORT_FORMATS[report_format]
+    rows = event_report_rows(event_ids, start_date, end_date)
+    response = Response(stream_with_context(stream_report(rows)), mimetype=mimetype)
+    if report_format == 'csv':
+        response.headers['Content-Disposition'] = 'attachment; filename=events_report.csv'
     
     return response
 
 @app.route('/send_selected_emails/<int:event_id>', methods=['POST'])
 def send_selected_emails(event_id):
-    """Send ticket emails to selected participants."""
-    logger.info(f"Starting selected email send for event ID: {event_id}")
+    """Queue ticket emails to selected participants."""
+    logger.info(f"Queueing selected emails for event ID: {event_id}")
     
     event = Event.query.get_or_404(event_id)
     selected_participant_ids = request.form.getlist('selected_participants')
@@ -420,283 +594,131 @@ def send_selected_emails(event_id):
         flash('No participants selected for email sending.', 'warning')
         return redirect(url_for('event_dashboard', event_id=event_id))
     
-    # Get selected participants
-    participants = Participant.query.filter(
+    recipients = db.session.query(Participant.id, Participant.email).filter(
         Participant.event_id == event_id,
         Participant.id.in_(selected_participant_ids)
     ).all()
     
-    logger.info(f"Found {len(participants)} selected participants for event: {event.name}")
-    
-    sent_count = 0
-    errors = []
-    start_time = time.time()
-    
-    # Test email connection first
-    try:
-        test_email_connection()
-        logger.info("Email connection test passed")
-    except Exception as e:
-        logger.error(f"Email connection test failed: {str(e)}")
-        flash(f'Email connection failed: {str(e)}', 'error')
-        return redirect(url_for('event_dashboard', event_id=event_id))
-    
-    for i, participant in enumerate(participants, 1):
-        try:
-            logger.info(f"Sending email {i}/{len(participants)} to: {participant.email}")
-            send_ticket_email(participant, event)
-            logger.info(f"✅ Email sent to {participant.email}")
-            sent_count += 1
-            
-            # Small delay to avoid overwhelming the SMTP server
-            if i < len(participants):
-                time.sleep(0.1)
-            
-        except Exception as e:
-            error_msg = f"Failed to send email to {participant.email}: {str(e)}"
-            logger.error(error_msg)
-            errors.append(error_msg)
-    
-    total_time = time.time() - start_time
-    logger.info(f"Selected email send completed in {total_time:.2f}s. Sent: {sent_count}, Errors: {len(errors)}")
-    
-    if sent_count > 0:
-        flash(f'Successfully sent {sent_count} emails to selected participants in {total_time:.1f} seconds!', 'success')
+    queued = enqueue_emails(event_id, EMAIL_KIND_TICKET, recipients)
+    db.session.commit()
+    start_email_delivery()
     
-    if errors:
-        flash(f'Email errors: {"; ".join(errors[:2])}', 'warning')
+    logger.info(f"Queued {queued} of {len(recipients)} selected participants for event: {event.name}")
+    flash(f'Queued {queued} emails to selected participants. They are sent in the background.', 'success')
+    if queued < len(recipients):
+        flash(f'{len(recipients) - queued} selected participants already had an email waiting to be sent.', 'info')
     
     return redirect(url_for('event_dashboard', event_id=event_id))
 
 @app.route('/send_emails/<int:event_id>')
 def send_bulk_emails(event_id):
-    """Send ticket emails to all participants of an event."""
-    logger.info(f"Starting bulk email send for event ID: {event_id}")
+    """Queue ticket emails to all participants of an event."""
+    logger.info(f"Queueing bulk emails for event ID: {event_id}")
     
     event = Event.query.get_or_404(event_id)
-    participants = Participant.query.filter_by(event_id=event_id).all()
+    recipients = db.session.query(Participant.id, Participant.email).filter(Participant.event_id == event_id).all()
+    
+    queued = enqueue_emails(event_id, EMAIL_KIND_TICKET, recipients)
+    db.session.commit()
+    start_email_delivery()
     
-    logger.info(f"Found {len(participants)} participants for event: {event.name}")
+    logger.info(f"Queued {queued} of {len(recipients)} participants for event: {event.name}")
     
-    # If it's an AJAX request, return JSON with progress
+    # If it's an AJAX request, return JSON; progress is at email_outbox_status
     if request.headers.get('Content-Type') == 'application/json' or request.headers.get('Accept') == 'application/json':
         return jsonify({
-            'status': 'started',
-            'total_participants': len(participants),
-            'message': f'Starting to send emails to {len(participants)} participants...'
+            'status': 'queued',
+            'total_participants': len(recipients),
+            'queued': queued,
+            'message': f'Queued emails to {queued} participants...'
         })
     
-    sent_count = 0
-    errors = []
-    
-    # Log email configuration (without sensitive data)
-    logger.info(f"Email config - Server: {app.config.get('MAIL_SERVER')}, Port: {app.config.get('MAIL_PORT')}")
-    logger.info(f"Email config - Username: {app.config.get('MAIL_USERNAME')}")
-    
-    start_time = time.time()
-    
-    # Test email connection first
-    try:
-        test_email_connection()
-        logger.info("Email connection test passed")
-    except Exception as e:
-        logger.error(f"Email connection test failed: {str(e)}")
-        flash(f'Email connection failed: {str(e)}', 'error')
-        return redirect(url_for('event_dashboard', event_id=event_id))
-    
-    for i, participant in enumerate(participants, 1):
-        try:
-            logger.info(f"Sending email {i}/{len(participants)} to: {participant.email}")
-            participant_start = time.time()
-            
-            send_ticket_email(participant, event)
-            
-            participant_time = time.time() - participant_start
-            logger.info(f"✅ Email sent to {participant.email} in {participant_time:.2f}s")
-            sent_count += 1
-            
-            # Progressive delay to avoid rate limits - increase delay after 25, 50, 75 emails
-            if i > 75:
-                delay = 3.0  # 3 seconds after 75 emails
-            elif i > 50:
-                delay = 2.0  # 2 seconds after 50 emails
-            elif i > 25:
-                delay = 1.0  # 1 second after 25 emails
-            else:
-                delay = 0.2  # 200ms for first 25 emails
-            
-            if i < len(participants):
-                logger.debug(f"Waiting {delay}s before next email...")
-                time.sleep(delay)
-            
-        except Exception as e:
-            error_msg = f"Failed to send email to {participant.email}: {str(e)}"
-            logger.error(error_msg)
-            errors.append(error_msg)
-            
-            # Check for rate limit or quota errors
-            error_str = str(e).lower()
-            if any(term in error_str for term in ['rate limit', 'quota', 'daily limit', '554', '421', '450']):
-                logger.error(f"🚫 Gmail rate limit or daily quota reached at email {i}!")
-                flash(f'Gmail daily limit reached after {sent_count} emails. Try again tomorrow or use a different email service.', 'warning')
-                break
-            
-            # If too many consecutive failures, stop
-            if len(errors) > 3 and sent_count == 0:
-                logger.error("Too many consecutive failures, stopping email send")
-                break
-    
-    total_time = time.time() - start_time
-    logger.info(f"Bulk email completed in {total_time:.2f}s. Sent: {sent_count}, Errors: {len(errors)}")
-    
-    if sent_count > 0:
-        flash(f'Successfully sent {sent_count} emails in {total_time:.1f} seconds!', 'success')
-    
-    if errors:
-        flash(f'Email errors: {"; ".join(errors[:2])}', 'warning')
-        logger.warning(f"Email errors summary: {len(errors)} failed out of {len(participants)}")
-    
+    flash(f'Queued {queued} emails. They are sent in the background.', 'success')
     return redirect(url_for('event_dashboard', event_id=event_id))
 
 
 @app.route('/send_pending_emails/<int:event_id>')
 def send_pending_emails(event_id):
-    """Send ticket emails only to participants who haven't received them yet."""
-    logger.info(f"Starting pending email send for event ID: {event_id}")
+    """Queue ticket emails only to participants who haven't received them yet."""
+    logger.info(f"Queueing pending emails for event ID: {event_id}")
     
     event = Event.query.get_or_404(event_id)
-    # Only get participants where email_sent is False or NULL
-    participants = Participant.query.filter_by(event_id=event_id, email_sent=False).all()
+    # Only participants where email_sent is False
+    recipients = db.session.query(Participant.id, Participant.email).filter_by(event_id=event_id, email_sent=False).all()
     
-    logger.info(f"Found {len(participants)} pending participants for event: {event.name}")
-    
-    if not participants:
+    if not recipients:
         flash('No pending participants found! All participants have already received their tickets.', 'info')
         return redirect(url_for('event_dashboard', event_id=event_id))
     
-    sent_count = 0
-    errors = []
-    
-    # Log email configuration (without sensitive data)
-    logger.info(f"Email config - Server: {app.config.get('MAIL_SERVER')}, Port: {app.config.get('MAIL_PORT')}")
-    logger.info(f"Email config - Username: {app.config.get('MAIL_USERNAME')}")
-    
-    start_time = time.time()
-    
-    # Test email connection first
-    try:
-        test_email_connection()
-        logger.info("Email connection test passed")
-    except Exception as e:
-        logger.error(f"Email connection test failed: {str(e)}")
-        flash(f'Email connection failed: {str(e)}', 'error')
-        return redirect(url_for('event_dashboard', event_id=event_id))
-    
-    for i, participant in enumerate(participants, 1):
-        try:
-            logger.info(f"Sending pending email {i}/{len(participants)} to: {participant.email}")
-            participant_start = time.time()
-            
-            send_ticket_email(participant, event)
-            
-            participant_time = time.time() - participant_start
-            logger.info(f"✅ Email sent to {participant.email} in {participant_time:.2f}s")
-            sent_count += 1
-            
-            # Progressive delay to avoid rate limits - same as bulk emails
-            if i > 75:
-                delay = 3.0  # 3 seconds after 75 emails
-            elif i > 50:
-                delay = 2.0  # 2 seconds after 50 emails
-            elif i > 25:
-                delay = 1.0  # 1 second after 25 emails
-            else:
-                delay = 0.2  # 200ms for first 25 emails
-            
-            if i < len(participants):
-                logger.debug(f"Waiting {delay}s before next email...")
-                time.sleep(delay)
-            
-        except Exception as e:
-            error_msg = f"Failed to send email to {participant.email}: {str(e)}"
-            logger.error(error_msg)
-            errors.append(error_msg)
-            
-            # Check for rate limit or quota errors
-            error_str = str(e).lower()
-            if any(term in error_str for term in ['rate limit', 'quota', 'daily limit', '554', '421', '450']):
-                logger.error(f"🚫 Gmail rate limit or daily quota reached at email {i}!")
-                flash(f'Gmail daily limit reached after {sent_count} emails. Try again tomorrow or use a different email service.', 'warning')
-                break
-            
-            # If too many consecutive failures, stop
-            if len(errors) > 3 and sent_count == 0:
-                logger.error("Too many consecutive failures, stopping pending email send")
-                break
-    
-    total_time = time.time() - start_time
-    logger.info(f"Pending email send completed in {total_time:.2f}s. Sent: {sent_count}, Errors: {len(errors)}")
-    
-    if sent_count > 0:
-        flash(f'Successfully sent {sent_count} pending emails in {total_time:.1f} seconds!', 'success')
+    queued = enqueue_emails(event_id, EMAIL_KIND_TICKET, recipients)
+    db.session.commit()
+    start_email_delivery()
     
-    if errors:
-        flash(f'Email errors: {"; ".join(errors[:2])}', 'warning')
-        logger.warning(f"Pending email errors summary: {len(errors)} failed out of {len(participants)}")
+    logger.info(f"Queued {queued} of {len(recipients)} pending participants for event: {event.name}")
+    if queued:
+        flash(f'Queued {queued} pending emails. They are sent in the background.', 'success')
+    else:
+        flash('All pending emails are already queued and will be sent shortly.', 'info')
     
     return redirect(url_for('event_dashboard', event_id=event_id))
 
 
 @app.route('/send_emails_progress/<int:event_id>')
 def send_emails_with_progress(event_id):
-    """Send emails with real-time progress updates via Server-Sent Events."""
+    """Queue ticket emails and stream the outbox's progress via Server-Sent Events."""
     import json
     
+    Event.query.get_or_404(event_id)
+    recipients = db.session.query(Participant.id, Participant.email).filter(Participant.event_id == event_id).all()
+    queued = enqueue_emails(event_id, EMAIL_KIND_TICKET, recipients)
+    db.session.commit()
+    start_email_delivery()
+    
     def generate_progress():
         with app.app_context():
-            event = Event.query.get_or_404(event_id)
-            participants = Participant.query.filter_by(event_id=event_id).all()
+            counts = outbox_status(event_id, EMAIL_KIND_TICKET)
+        total = counts['pending'] + counts['sending']
+        sent_before, failed_before = counts['sent'], counts['failed']
         
-        yield f"data: {json.dumps({'status': 'started', 'total': len(participants), 'message': 'Starting email send...'})}\n\n"
+        yield f"data: {json.dumps({'status': 'started', 'total': total, 'message': f'Queued {queued} emails, {total} waiting to be sent...'})}\n\n"
         
-        sent_count = 0
-        errors = []
-        
-        # Test connection first
-        try:
+        last_change = time.time()
+        while True:
             with app.app_context():
-                test_email_connection()
-            yield f"data: {json.dumps({'status': 'progress', 'message': 'Email connection verified ✅'})}\n\n"
-        except Exception as e:
-            yield f"data: {json.dumps({'status': 'error', 'message': f'Email connection failed: {str(e)}'})}\n\n"
-            return
-        
-        for i, participant in enumerate(participants, 1):
-            try:
-                yield f"data: {json.dumps({'status': 'progress', 'current': i, 'total': len(participants), 'message': f'Sending to {participant.email}...'})}\n\n"
-                
-                with app.app_context():
-                    send_ticket_email(participant, event)
-                sent_count += 1
-                
-                yield f"data: {json.dumps({'status': 'progress', 'current': i, 'total': len(participants), 'message': f'Sent to {participant.email} ✅'})}\n\n"
-                
-                # Small delay
-                time.sleep(0.1)
-                
-            except Exception as e:
-                errors.append(str(e))
-                yield f"data: {json.dumps({'status': 'progress', 'current': i, 'total': len(participants), 'message': f'Failed to send to {participant.email} ❌'})}\n\n"
+                latest = outbox_status(event_id, EMAIL_KIND_TICKET)
+            if latest != counts:
+                counts, last_change = latest, time.time()
+            
+            remaining = counts['pending'] + counts['sending']
+            sent, failed = counts['sent'] - sent_before, counts['failed'] - failed_before
+            yield f"data: {json.dumps({'status': 'progress', 'current': max(total - remaining, 0), 'total': total, 'message': f'{sent} sent, {failed} failed, {remaining} waiting'})}\n\n"
+            
+            # Messages waiting for a retry are left to the background sender
+            if not remaining or time.time() - last_change > 60:
+                break
+            time.sleep(1)
         
-        yield f"data: {json.dumps({'status': 'completed', 'sent': sent_count, 'errors': len(errors), 'message': 'Email send completed!'})}\n\n"
+        yield f"data: {json.dumps({'status': 'completed', 'sent': sent, 'errors': failed, 'message': 'Email send completed!' if not remaining else f'{remaining} emails will be retried in the background'})}\n\n"
     
     response = app.response_class(generate_progress(), mimetype='text/event-stream')
     response.headers['Cache-Control'] = 'no-cache'
     response.headers['Connection'] = 'keep-alive'
     return response
 
-def send_certificate_email(participant, certificate, event):
-    """Send certificate email to participant with PDF attachment"""
+@app.route('/event/<int:event_id>/email_outbox')
+def email_outbox_status(event_id):
+    """Progress of an event's queued emails, optionally of one kind."""
+    Event.query.get_or_404(event_id)
+    kind = request.args.get('kind')
+    return jsonify({
+        'event_id': event_id,
+        'kind': kind,
+        'counts': outbox_status(event_id, kind),
+        'send_rate': send_rate_limiter.stats()
+    })
+
+def send_certificate_email(participant, certificate, event, mailer=None):
+    """Send certificate email to participant with PDF attachment, reusing mailer's connection if given"""
     try:
         logger.info(f"Starting certificate email generation for {participant.email}")
         
@@ -1032,10 +1054,15 @@ def send_certificate_email(participant, certificate, event):
         
         # Send email
         logger.info("Sending email...")
-        mail.send(msg)
+        if mailer is not None:
+            mailer.send(msg)
+        else:
+            with BatchMailer(mail) as single_mailer:
+                single_mailer.send(msg)
         
         # Update certificate email_sent status
         certificate.email_sent = True
+        certificate.email_sent_date = datetime.now()
         db.session.commit()
         
         logger.info(f"Certificate email with attachment sent successfully to {participant.email}")
@@ -1047,6 +1074,24 @@ def send_certificate_email(participant, certificate, event):
         logger.error(f"Traceback: {traceback.format_exc()}")
         raise e
 
+def deliver_outbox_email(entry, mailer):
+    """Build and send the message of an email outbox row over the sender's batch connection."""
+    participant = db.session.get(Participant, entry.participant_id)
+    if participant is None:
+        raise UndeliverableEmail(f'Participant {entry.participant_id} no longer exists')
+    
+    if entry.kind == EMAIL_KIND_CERTIFICATE:
+        if participant.certificate is None:
+            raise UndeliverableEmail(f'Participant {participant.id} has no certificate')
+        send_certificate_email(participant, participant.certificate, participant.event, mailer)
+    else:
+        send_ticket_email(participant, participant.event, mailer)
+
+def start_email_delivery():
+    """Send queued emails from this process, unless email_worker.py does it."""
+    if app.config['EMAIL_OUTBOX_RUN_IN_THREAD']:
+        start_outbox_thread(app, mail, deliver_outbox_email)
+
 def test_email_connection():
     """Test email connection without sending."""
     import smtplib
@@ -1065,8 +1110,8 @@ def test_email_connection():
     
     logger.info("Email connection test successful")
 
-def send_ticket_email(participant, event):
-    """Send individual ticket email to a participant."""
+def send_ticket_email(participant, event, mailer=None):
+    """Send individual ticket email to a participant, reusing mailer's connection if given."""
     try:
         logger.info(f"Preparing email for {participant.email}")
         
@@ -1130,35 +1175,15 @@ def send_ticket_email(participant, event):
                 logger.warning(f"Failed to attach logo: {attachment_error}")
                 # Continue sending email without logo
         
-        # Send email with timeout and retry handling
+        # Send over the caller's batch connection, or a connection of its own
         logger.info(f"Attempting to send email to {participant.email}...")
         send_start = time.time()
         
-        # Configure Flask-Mail to use shorter timeouts with retry logic
-        max_retries = 3
-        retry_count = 0
-        
-        while retry_count < max_retries:
-            try:
-                with mail.connect() as conn:
-                    conn.send(msg)
-                break  # Success, exit retry loop
-                
-            except Exception as send_error:
-                retry_count += 1
-                logger.warning(f"Email send attempt {retry_count} failed for {participant.email}: {str(send_error)}")
-                
-                # Check for rate limit or quota errors
-                error_str = str(send_error).lower()
-                if any(term in error_str for term in ['rate limit', 'quota', 'daily limit', '554', '421', '450']):
-                    logger.error(f"🚫 Rate limit or quota exceeded for {participant.email}")
-                    raise Exception(f"Email quota/rate limit exceeded: {send_error}")
-                
-                if retry_count >= max_retries:
-                    raise send_error
-                    
-                # Wait before retry
-                time.sleep(2 ** retry_count)  # Exponential backoff
+        if mailer is not None:
+            mailer.send(msg)
+        else:
+            with BatchMailer(mail) as single_mailer:
+                single_mailer.send(msg)
         
         send_time = time.time() - send_start
         logger.info(f"✅ Email sent successfully to {participant.email} in {send_time:.2f}s")
@@ -1191,6 +1216,14 @@ def send_single_email(participant_id):
     
     return redirect(url_for('event_dashboard', event_id=event.id))
 
+@app.route('/debug/cache-stats')
+def debug_cache_stats():
+    """Debug route showing hit/miss metrics of the in-process caches."""
+    return jsonify({
+        'ticket_index': ticket_cache.stats(),
+        'dashboard': dashboard_cache.stats()
+    })
+
 @app.route('/debug/email-config')
 def debug_email_config():
     """Debug route to check email configuration."""
@@ -1359,7 +1392,7 @@ def certificate_preview(event_id):
     
     # Get statistics
     total_participants = Participant.query.filter_by(event_id=event_id).count()
-    checked_in_participants = Participant.query.filter_by(event_id=event_id, checked_in=True).all()
+    checked_in_participants = event_participants(event_id, checked_in=True)
     checked_in_count = len(checked_in_participants)
     
     # Get participants eligible for certificates (checked in but no certificate yet)
@@ -1707,12 +1740,9 @@ def reissue_certificates_bulk(event_id):
     try:
         success_count = 0
         error_count = 0
+        reissued = []
         
-        for participant_id in participant_ids:
-            participant = Participant.query.get(participant_id)
-            if not participant or participant.event_id != event.id:
-                continue
-                
+        for participant in participants_by_ids(event.id, participant_ids):
             if not participant.checked_in:
                 error_count += 1
                 continue
@@ -1746,9 +1776,7 @@ def reissue_certificates_bulk(event_id):
                 
                 db.session.add(certificate)
                 db.session.commit()
-                
-                # Send certificate email
-                send_certificate_email(participant, certificate, event)
+                reissued.append((participant.id, participant.email))
                 
                 success_count += 1
                 logger.info(f"Certificate re-issued for participant {participant.id} in event {event.id}")
@@ -1758,9 +1786,15 @@ def reissue_certificates_bulk(event_id):
                 logger.error(f"Error re-issuing certificate for participant {participant.id}: {str(e)}")
                 error_count += 1
         
+        # Certificate emails are sent in the background
+        if reissued:
+            enqueue_emails(event.id, EMAIL_KIND_CERTIFICATE, reissued)
+            db.session.commit()
+            start_email_delivery()
+        
         # Show results
         if success_count > 0:
-            flash(f'Successfully re-issued {success_count} certificate(s).', 'success')
+            flash(f'Successfully re-issued {success_count} certificate(s). Emails are sent in the background.', 'success')
         if error_count > 0:
             flash(f'Failed to re-issue {error_count} certificate(s). Check that participants are checked in.', 'warning')
         
@@ -1829,10 +1863,7 @@ def generate_certificates(event_id):
             logger.info(f"Certificate configuration saved for event {event.name}")
             
             # Get eligible participants
-            eligible_participants = Participant.query.filter_by(
-                event_id=event_id, 
-                checked_in=True
-            ).all()
+            eligible_participants = event_participants(event_id, checked_in=True)
             
             # Filter out participants who already have certificates
             participants_to_process = [p for p in eligible_participants if not p.has_certificate]
@@ -1842,7 +1873,7 @@ def generate_certificates(event_id):
                 return redirect(url_for('certificate_preview', event_id=event_id))
             
             certificates_created = 0
-            certificates_sent = 0
+            recipients = []
             errors = []
             
             for participant in participants_to_process:
@@ -1873,17 +1904,7 @@ def generate_certificates(event_id):
                     db.session.flush()  # Get the certificate ID
                     
                     certificates_created += 1
-                    
-                    # Send certificate email
-                    try:
-                        send_certificate_email(participant, certificate, event)
-                        certificate.email_sent = True
-                        certificate.email_sent_date = datetime.now()
-                        certificates_sent += 1
-                        logger.info(f"Certificate sent to {participant.email}")
-                    except Exception as email_error:
-                        logger.error(f"Failed to send certificate email to {participant.email}: {str(email_error)}")
-                        errors.append(f"Certificate created for {participant.name} but email failed: {str(email_error)}")
+                    recipients.append((participant.id, participant.email))
                     
                 except Exception as e:
                     logger.error(f"Failed to create certificate for {participant.name}: {str(e)}")
@@ -1892,12 +1913,17 @@ def generate_certificates(event_id):
             
             db.session.commit()
             
+            # Certificate emails are sent in the background
+            certificates_queued = enqueue_emails(event_id, EMAIL_KIND_CERTIFICATE, recipients)
+            db.session.commit()
+            start_email_delivery()
+            
             # Provide feedback
             if certificates_created > 0:
                 flash(f'✅ Successfully created {certificates_created} certificates and saved configuration for {event.name}!', 'success')
                 
-            if certificates_sent > 0:
-                flash(f'📧 Successfully sent {certificates_sent} certificate emails!', 'success')
+            if certificates_queued > 0:
+                flash(f'📧 Queued {certificates_queued} certificate emails. They are sent in the background.', 'success')
             
             if errors:
                 for error in errors[:5]:  # Show max 5 errors
@@ -2109,7 +2135,7 @@ def certificate_test_simple(event_id):
     
     # Get statistics
     total_participants = Participant.query.filter_by(event_id=event_id).count()
-    checked_in_participants = Participant.query.filter_by(event_id=event_id, checked_in=True).all()
+    checked_in_participants = event_participants(event_id, checked_in=True)
     checked_in_count = len(checked_in_participants)
     
     eligible_participants = []
@@ -2152,8 +2178,8 @@ def add_participant_manually(event_id):
                 flash(f'A participant with email {email} already exists in this event.', 'error')
                 return render_template('add_participant.html', event=event, form=form)
             
-            # Generate ticket number
-            ticket_number = event.generate_next_ticket_number()
+            # Reserve ticket number from the event's counter
+            ticket_number = reserve_ticket_numbers(event)[0]
             
             # Create new participant
             participant = Participant(
@@ -2302,18 +2328,16 @@ def delete_participants_bulk(event_id):
         deleted_count = 0
         deleted_names = []
         
-        for participant_id in selected_participants:
-            participant = Participant.query.filter_by(id=participant_id, event_id=event_id).first()
-            if participant:
-                deleted_names.append(participant.name)
-                
-                # Delete associated certificate if exists
-                if participant.has_certificate:
-                    db.session.delete(participant.certificate)
-                
-                # Delete participant
-                db.session.delete(participant)
-                deleted_count += 1
+        for participant in participants_by_ids(event_id, selected_participants, for_delete=True):
+            deleted_names.append(participant.name)
+            
+            # Delete associated certificate if exists
+            if participant.has_certificate:
+                db.session.delete(participant.certificate)
+            
+            # Delete participant
+            db.session.delete(participant)
+            deleted_count += 1
         
         db.session.commit()
         
@@ -2394,9 +2418,8 @@ def upload_quiz_questions(event_id, quiz_id):
             return redirect(url_for('quiz_dashboard', event_id=event_id, quiz_id=quiz_id))
         
         if file and file.filename.endswith('.csv'):
-            # Read CSV file
-            stream = io.StringIO(file.stream.read().decode("UTF8"), newline=None)
-            csv_input = csv.DictReader(stream)
+            # Read CSV file incrementally
+            csv_input = csv.DictReader(iter_csv_lines(file.stream))
             
             questions_added = 0
             for row in csv_input:
@@ -2719,5 +2742,13 @@ def generate_quiz_qr(event_id, quiz_id):
                          quiz_url=quiz_url,
                          qr_code_base64=qr_code_base64)
 
+# Resume import jobs and emails left queued, backed off or mid-run by a previous run of this process
+with app.app_context():
+    if app.config['IMPORT_JOBS_RUN_IN_THREAD']:
+        resume_import_jobs(app)
+    if app.config['EMAIL_OUTBOX_RUN_IN_THREAD'] and next_outbox_wakeup() is not None:
+        start_email_delivery()
+    db.session.remove()
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
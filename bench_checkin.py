@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Check-in Load Benchmark
+Seed a throwaway event with participants and replay concurrent check-in
+traffic from several gates against the scan and toggle endpoints, then
+report latency percentiles, throughput and lock conflicts.
+
+    python bench_checkin.py --participants 5000 --gates 8
+    python bench_checkin.py --database-url sqlite:////tmp/bench.db --database-url postgresql://localhost/ticketing_bench
+
+Without --database-url a temporary SQLite database is used. Each database
+is benchmarked in its own process because the app binds its database when
+it is imported.
+"""
+
+import os
+import sys
+import math
+import time
+import queue
+import random
+import argparse
+import tempfile
+import threading
+import subprocess
+from datetime import date
+
+# SQLSTATEs of PostgreSQL serialization failures, deadlocks and lock timeouts
+PG_LOCK_CONFLICT_CODES = {'40001', '40P01', '55P03'}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark concurrent check-ins from several gates.')
+    parser.add_argument('--database-url', action='append', dest='database_urls',
+                        help='database to benchmark; repeat to compare databases (default: temporary SQLite)')
+    parser.add_argument('--participants', type=int, default=2000, help='participants seeded into the event')
+    parser.add_argument('--gates', type=int, default=8, help='concurrent gates replaying check-ins')
+    parser.add_argument('--endpoint', choices=['scan', 'toggle', 'both'], default='both',
+                        help='endpoint to benchmark; both runs scans, then toggles')
+    parser.add_argument('--rescan-rate', type=float, default=0.1,
+                        help='share of tickets presented again at another gate')
+    parser.add_argument('--seed', type=int, default=42, help='random seed for the traffic mix')
+    parser.add_argument('--keep', action='store_true', help='keep the benchmark event afterwards')
+    return parser.parse_args(argv)
+
+
+def run_each_database(args):
+    """Benchmark every requested database in a separate process."""
+    for database_url in args.database_urls:
+        command = [
+            sys.executable, os.path.abspath(__file__),
+            '--database-url', database_url,
+            '--participants', str(args.participants),
+            '--gates', str(args.gates),
+            '--endpoint', args.endpoint,
+            '--rescan-rate', str(args.rescan_rate),
+            '--seed', str(args.seed)
+        ]
+        if args.keep:
+            command.append('--keep')
+        subprocess.run(command, check=False)
+
+
+class LockConflictCounter:
+    """Count database errors caused by lock contention, from an engine hook."""
+
+    def __init__(self):
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, context):
+        if is_lock_conflict(context.original_exception):
+            with self.lock:
+                self.count += 1
+
+
+def is_lock_conflict(error):
+    if getattr(error, 'pgcode', None) in PG_LOCK_CONFLICT_CODES:
+        return True
+    message = str(error).lower()
+    return 'database is locked' in message or 'database table is locked' in message
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(fraction * len(sorted_values)) - 1, 0)
+    return sorted_values[rank]
+
+
+def seed_event(participant_count):
+    """Create a benchmark event and import its participants through the app's importer."""
+    from models import db, Event, Participant
+    from participant_import import import_participants
+
+    alias = 'B' + ''.join(random.choices('ABCDEFGHJKLMNPQRSTUVWXYZ', k=5))
+    event = Event(name=f'Check-in benchmark {alias}', alias_name=alias, date=date.today())
+    db.session.add(event)
+    db.session.commit()
+
+    rows = ({'name': f'Bench Guest {i}', 'email': f'guest{i}@{alias.lower()}.bench.test'}
+            for i in range(participant_count))
+    added, errors = import_participants(event, rows, 'name', 'email')
+    db.session.commit()
+    if errors:
+        print(f"⚠️  {len(errors)} participants were rejected while seeding: {errors[:3]}")
+
+    participants = db.session.query(Participant.id, Participant.ticket_number).filter(
+        Participant.event_id == event.id
+    ).all()
+    return event.id, participants
+
+
+def delete_event(event_id):
+    """Remove the benchmark event and the rows maintained for it."""
+    from models import db, Event
+    from event_stats import EventCounter
+    from ticketing import TicketCounter
+    from import_jobs import ImportJob
+
+    TicketCounter.query.filter_by(event_id=event_id).delete(synchronize_session=False)
+    EventCounter.query.filter_by(event_id=event_id).delete(synchronize_session=False)
+    ImportJob.query.filter_by(event_id=event_id).delete(synchronize_session=False)
+    db.session.delete(db.session.get(Event, event_id))
+    db.session.commit()
+
+
+def plan_operations(event_id, participants, endpoint, rescan_rate, rng):
+    """Build the shuffled request list of one phase; every participant appears at least once."""
+    repeats = rng.sample(participants, int(len(participants) * rescan_rate))
+    operations = []
+    for participant_id, ticket_number in participants + repeats:
+        if endpoint == 'scan':
+            operations.append((participant_id, f'/event/{event_id}/scan', {'ticket_number': ticket_number}))
+        else:
+            operations.append((participant_id, f'/participant/{participant_id}/checkin', None))
+    rng.shuffle(operations)
+    return operations
+
+
+def run_gate(app, operations, results):
+    """Replay requests from the shared queue as one gate until it is empty."""
+    client = app.test_client()
+    while True:
+        try:
+            participant_id, path, payload = operations.get_nowait()
+        except queue.Empty:
+            return
+
+        started = time.perf_counter()
+        try:
+            response = client.post(path, json=payload)
+            body = response.get_json(silent=True) or {}
+            if response.status_code >= 500:
+                outcome = 'error'
+            elif 'status' in body:
+                outcome = body['status']
+            else:
+                outcome = 'checked_in' if body.get('checked_in') else 'checked_out'
+        except Exception as e:
+            outcome = 'error'
+            print(f"❌ {path}: {str(e)}")
+        results.append((time.perf_counter() - started, outcome))
+
+
+def run_phase(app, event_id, participants, endpoint, gates, rescan_rate, rng, conflicts):
+    operations = plan_operations(event_id, participants, endpoint, rescan_rate, rng)
+    pending = queue.Queue()
+    for operation in operations:
+        pending.put(operation)
+
+    results = []
+    conflicts_before = conflicts.count
+    threads = [threading.Thread(target=run_gate, args=(app, pending, results)) for _ in range(gates)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for latency, _ in results)
+    outcomes = {}
+    for _, outcome in results:
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    per_participant = {}
+    for participant_id, _, _ in operations:
+        per_participant[participant_id] = per_participant.get(participant_id, 0) + 1
+
+    return {
+        'endpoint': endpoint,
+        'requests': len(results),
+        'seconds': elapsed,
+        'throughput': len(results) / elapsed if elapsed else 0.0,
+        'p50': percentile(latencies, 0.50) * 1000,
+        'p95': percentile(latencies, 0.95) * 1000,
+        'p99': percentile(latencies, 0.99) * 1000,
+        'lock_conflicts': conflicts.count - conflicts_before,
+        'outcomes': outcomes,
+        'per_participant': per_participant
+    }
+
+
+def print_phase(report):
+    print(f"\n🚪 {report['endpoint']}: {report['requests']} requests in {report['seconds']:.2f}s")
+    print(f"   ⚡ Throughput: {report['throughput']:.1f} req/s")
+    print(f"   ⏱️  Latency: p50 {report['p50']:.1f} ms | p95 {report['p95']:.1f} ms | p99 {report['p99']:.1f} ms")
+    print(f"   🔒 Lock conflicts: {report['lock_conflicts']}")
+    print(f"   📋 Outcomes: {report['outcomes']}")
+
+
+def verify_event(event_id, participant_count, reports):
+    """Check the final check-in state against what the replayed traffic implies."""
+    from models import db, Participant
+    from event_stats import get_event_stats, get_event_counters
+
+    checked_in = {pid for (pid,) in db.session.query(Participant.id).filter(
+        Participant.event_id == event_id, Participant.checked_in == True
+    )}
+
+    ok = True
+    for report in reports:
+        if report['endpoint'] == 'scan' and report['outcomes'].get('ok', 0) != participant_count:
+            print(f"⚠️  Expected {participant_count} successful scans, got {report['outcomes'].get('ok', 0)}")
+            ok = False
+
+    # Scans check everyone in; every toggle afterwards flips the state once
+    expected = set()
+    for pid in {pid for report in reports for pid in report['per_participant']}:
+        state = False
+        for report in reports:
+            count = report['per_participant'].get(pid, 0)
+            state = (state or count > 0) if report['endpoint'] == 'scan' else state ^ (count % 2 == 1)
+        if state:
+            expected.add(pid)
+    if checked_in != expected:
+        print(f"⚠️  {len(checked_in ^ expected)} participants ended in the wrong check-in state")
+        ok = False
+
+    db.session.expire_all()
+    stats, counters = get_event_stats(event_id), get_event_counters(event_id)
+    drift = {field: (counters[field], stats[field]) for field in stats if counters.get(field) != stats[field]}
+    if drift:
+        print(f"⚠️  Event counters drifted from the participants table: {drift}")
+        ok = False
+
+    if ok:
+        print(f"\n✅ Final state is consistent: {len(checked_in)} checked in, counters match")
+    return ok
+
+
+def run_benchmark(args, database_url):
+    os.environ['DATABASE_URL'] = database_url
+
+    from app import app
+    from models import db
+    from sqlalchemy import event as sa_event
+
+    rng = random.Random(args.seed)
+    conflicts = LockConflictCounter()
+
+    with app.app_context():
+        dialect = db.engine.dialect.name
+        sa_event.listen(db.engine, 'handle_error', conflicts)
+
+        print("🏁 CHECK-IN LOAD BENCHMARK")
+        print("=" * 50)
+        print(f"🗄️  Database: {dialect}")
+        print(f"👥 Participants: {args.participants} | 🚪 Gates: {args.gates} | 🔁 Rescan rate: {args.rescan_rate:.0%}")
+
+        started = time.perf_counter()
+        event_id, participants = seed_event(args.participants)
+        print(f"🌱 Seeded event {event_id} with {len(participants)} participants in {time.perf_counter() - started:.2f}s")
+
+    endpoints = ['scan', 'toggle'] if args.endpoint == 'both' else [args.endpoint]
+    reports = []
+    for endpoint in endpoints:
+        report = run_phase(app, event_id, participants, endpoint, args.gates, args.rescan_rate, rng, conflicts)
+        print_phase(report)
+        reports.append(report)
+
+    with app.app_context():
+        ok = verify_event(event_id, len(participants), reports)
+        if not args.keep:
+            delete_event(event_id)
+            print(f"🧹 Removed benchmark event {event_id}")
+    return ok
+
+
+def main():
+    args = parse_args()
+    if args.participants < 1 or args.gates < 1 or not 0 <= args.rescan_rate <= 1:
+        print("❌ --participants and --gates must be positive and --rescan-rate between 0 and 1")
+        sys.exit(1)
+
+    if args.database_urls and len(args.database_urls) > 1:
+        run_each_database(args)
+        return
+
+    if args.database_urls:
+        database_url = args.database_urls[0]
+    else:
+        database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench_checkin_'), 'bench.db')}"
+
+    if not run_benchmark(args, database_url):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
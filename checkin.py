@@ -0,0 +1,319 @@
+"""
+Ticket scan check-in for the Event Ticketing System.
+Checks participants in by the ticket number from their QR code with a
+single conditional UPDATE, so repeated scans at the gate are idempotent,
+and toggles check-in state atomically for the dashboard.
+"""
+
+import logging
+from datetime import datetime
+from models import db, Participant
+from event_stats import adjust_event_counters
+from live_feed import queue_live_update
+from ticket_cache import TicketEntry, queue_ticket_update, ticket_cache
+
+logger = logging.getLogger(__name__)
+
+# Scan verdicts returned to the scanner
+SCAN_OK = 'ok'
+SCAN_ALREADY_CHECKED_IN = 'already_checked_in'
+SCAN_UNKNOWN = 'unknown'
+SCAN_WRONG_EVENT = 'wrong_event'
+
+
+def normalize_ticket_number(value):
+    """Clean a scanned QR payload into a ticket number."""
+    return (value or '').strip().upper()
+
+
+def _has_certificate():
+    # Spelled out with qualified names: some dialects render RETURNING columns
+    # unqualified, which would make a correlated subquery compare the wrong id
+    return db.literal_column(
+        'EXISTS (SELECT 1 FROM certificates WHERE certificates.participant_id = participants.id)'
+    ).label('has_certificate')
+
+
+def _record_checkin_change(event_id, participant_id, ticket_number, checked_in, checkin_time, has_certificate):
+    # Statement-level updates bypass the ORM hooks that maintain counters, the live feed and the ticket index
+    delta = 1 if checked_in else -1
+    adjust_event_counters(event_id, checked_in=delta, eligible_for_certificates=0 if has_certificate else delta)
+    queue_live_update(db.session, event_id, participant_id, checked_in, checkin_time)
+    queue_ticket_update(db.session, event_id, ticket_number, checked_in, checkin_time)
+
+
+def toggle_participant_checkin(participant_id):
+    """Flip a participant's check-in state with one UPDATE and report both states.
+
+    ``checked_in`` is negated by the database rather than written from a
+    value read earlier, so two concurrent toggles always apply one after the
+    other. Returns a dict with the participant's id, event_id, name,
+    previous and new check-in state and checkin_time, or None when there is
+    no such participant; the caller commits.
+    """
+    now = datetime.now()
+    stmt = (
+        db.update(Participant)
+        .where(Participant.id == participant_id)
+        .values(
+            # Both right-hand sides see the row as it was before the update
+            checked_in=db.not_(Participant.checked_in),
+            checkin_time=db.case((Participant.checked_in == True, None), else_=now)
+        )
+        .execution_options(synchronize_session=False)
+    )
+    columns = (Participant.id, Participant.event_id, Participant.name, Participant.ticket_number,
+               Participant.checked_in, Participant.checkin_time, _has_certificate())
+
+    if db.session.get_bind().dialect.update_returning:
+        row = db.session.execute(stmt.returning(*columns)).first()
+    else:
+        # The updated row stays locked until commit, so reading it back sees this toggle
+        row = None
+        if db.session.execute(stmt).rowcount:
+            row = db.session.execute(db.select(*columns).where(Participant.id == participant_id)).first()
+
+    if row is None:
+        return None
+
+    _record_checkin_change(row.event_id, row.id, row.ticket_number, row.checked_in, row.checkin_time,
+                           row.has_certificate)
+    return {
+        'id': row.id,
+        'event_id': row.event_id,
+        'name': row.name,
+        'previous_checked_in': not row.checked_in,
+        'checked_in': bool(row.checked_in),
+        'checkin_time': row.checkin_time
+    }
+
+
+def scan_checkin(event_id, ticket_number):
+    """Check a ticket in for an event; repeated scans never check it out.
+
+    Tickets are resolved against the in-process ticket index, which holds
+    the event's whole roster and is dropped on roster changes, so unknown
+    and wrong-event tickets are answered without a query. A ticket of this
+    event's own series that is not indexed is looked up once, in case
+    another process just added it. Known tickets run a single UPDATE
+    guarded by ``checked_in = false``; when it matches nothing the ticket
+    was already checked in. ``ticket_number`` should already be
+    normalized. Returns a (verdict, details) tuple; the caller commits.
+    """
+    if not ticket_number:
+        return SCAN_UNKNOWN, None
+
+    cached = ticket_cache.lookup(event_id, ticket_number)
+    if cached is None:
+        series_event_id = ticket_cache.ticket_event_id(ticket_number)
+        if series_event_id is None:
+            return SCAN_UNKNOWN, None
+        if series_event_id != event_id:
+            return SCAN_WRONG_EVENT, None
+
+        row = db.session.execute(
+            db.select(Participant.id, Participant.name, Participant.checked_in, Participant.checkin_time)
+            .where(Participant.ticket_number == ticket_number, Participant.event_id == event_id)
+        ).first()
+        if row is None:
+            return SCAN_UNKNOWN, None
+        cached = TicketEntry(row.id, row.name, row.checked_in, row.checkin_time)
+        ticket_cache.remember(event_id, ticket_number, cached)
+
+    now = datetime.now()
+    stmt = (
+        db.update(Participant)
+        .where(Participant.id == cached.participant_id, Participant.checked_in == False)
+        .values(checked_in=True, checkin_time=now)
+        .execution_options(synchronize_session=False)
+    )
+
+    if db.session.get_bind().dialect.update_returning:
+        row = db.session.execute(stmt.returning(_has_certificate())).first()
+    else:
+        # Without UPDATE ... RETURNING the row is read back inside the same transaction
+        row = None
+        if db.session.execute(stmt).rowcount:
+            row = db.session.execute(
+                db.select(_has_certificate()).select_from(Participant).where(Participant.id == cached.participant_id)
+            ).first()
+
+    if row is not None:
+        _record_checkin_change(event_id, cached.participant_id, ticket_number, True, now, row.has_certificate)
+        return SCAN_OK, {'id': cached.participant_id, 'name': cached.name, 'checkin_time': now.isoformat()}
+
+    if not cached.checked_in:
+        # Checked in by another process since the index was loaded
+        queue_ticket_update(db.session, event_id, ticket_number, True, None)
+    return SCAN_ALREADY_CHECKED_IN, {
+        'id': cached.participant_id,
+        'name': cached.name,
+        'checkin_time': cached.checkin_time.isoformat() if cached.checkin_time else None
+    }
+
+
+# Maximum scan records accepted in one offline sync request
+MAX_SYNC_BATCH = 5000
+
+# Ticket numbers resolved per lookup query during a sync
+SYNC_LOOKUP_CHUNK = 500
+
+
+def parse_scanned_at(value):
+    """Parse a scanner timestamp (ISO 8601 or epoch seconds) into local naive time.
+
+    Check-in times are stored as naive local times, like ``toggle_checkin``.
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return datetime.fromtimestamp(value)
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError('missing scanned_at')
+
+    scanned_at = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    if scanned_at.tzinfo is not None:
+        scanned_at = scanned_at.astimezone().replace(tzinfo=None)
+    return scanned_at
+
+
+def _lookup_tickets(ticket_numbers):
+    """Resolve ticket numbers to participant rows, locking them where supported."""
+    rows = {}
+    ticket_numbers = list(ticket_numbers)
+    for start in range(0, len(ticket_numbers), SYNC_LOOKUP_CHUNK):
+        stmt = (
+            db.select(Participant.id, Participant.event_id, Participant.ticket_number,
+                      Participant.checked_in, Participant.checkin_time, _has_certificate())
+            .where(Participant.ticket_number.in_(ticket_numbers[start:start + SYNC_LOOKUP_CHUNK]))
+            .with_for_update()
+        )
+        for row in db.session.execute(stmt):
+            rows[row.ticket_number] = row
+    return rows
+
+
+def sync_offline_scans(event_id, records):
+    """Apply a batch of offline scans for an event with first-scan-wins rules.
+
+    ``records`` is a list of dicts with ticket_number, scanned_at and
+    device_id. Scans are applied in scanned_at order: the earliest scan of a
+    ticket is its check-in, even when an online scan was recorded later, and
+    every other scan of that ticket reports already_checked_in. Returns one
+    result per record, in request order; the caller commits.
+    """
+    results = [None] * len(records)
+    scans = []
+
+    for index, record in enumerate(records):
+        record = record if isinstance(record, dict) else {}
+        ticket_number = normalize_ticket_number(record.get('ticket_number'))
+        result = {'index': index, 'ticket_number': ticket_number, 'device_id': record.get('device_id')}
+        results[index] = result
+        try:
+            if not ticket_number:
+                raise ValueError('missing ticket_number')
+            scans.append((parse_scanned_at(record.get('scanned_at')), index, ticket_number))
+        except (TypeError, ValueError, OverflowError, OSError) as e:
+            result.update(status='invalid', message=str(e))
+
+    participants = _lookup_tickets({ticket_number for _, _, ticket_number in scans})
+
+    # Current check-in time per participant, updated as the batch is replayed
+    checkin_times = {}
+    for row in participants.values():
+        if row.event_id == event_id and row.checked_in:
+            checkin_times[row.id] = row.checkin_time
+
+    winners = {}
+    for scanned_at, index, ticket_number in sorted(scans):
+        result = results[index]
+        row = participants.get(ticket_number)
+        if row is None:
+            result['status'] = SCAN_UNKNOWN
+            continue
+        if row.event_id != event_id:
+            result['status'] = SCAN_WRONG_EVENT
+            continue
+
+        result['participant_id'] = row.id
+        current = checkin_times.get(row.id)
+        if row.id not in checkin_times or current is None or scanned_at < current:
+            # This scan is the earliest known check-in of the ticket
+            if row.id in winners:
+                results[winners[row.id]]['status'] = SCAN_ALREADY_CHECKED_IN
+            winners[row.id] = index
+            checkin_times[row.id] = scanned_at
+            result['status'] = SCAN_OK
+        else:
+            result['status'] = SCAN_ALREADY_CHECKED_IN
+
+    for result in results:
+        if result.get('participant_id') in checkin_times:
+            checkin_time = checkin_times[result['participant_id']]
+            result['checkin_time'] = checkin_time.isoformat() if checkin_time else None
+
+    if winners:
+        _apply_winning_scans(event_id, participants, winners, checkin_times)
+
+    logger.info(f"Offline sync for event {event_id}: {len(records)} scans, {len(winners)} check-ins applied")
+    return results
+
+
+def _apply_winning_scans(event_id, participants, winners, checkin_times):
+    by_id = {row.id: row for row in participants.values()}
+    table = Participant.__table__
+    stmt = (
+        table.update()
+        .where(
+            table.c.id == db.bindparam('participant_id'),
+            db.or_(
+                table.c.checked_in == False,
+                table.c.checkin_time.is_(None),
+                table.c.checkin_time > db.bindparam('scanned_at')
+            )
+        )
+        .values(checked_in=True, checkin_time=db.bindparam('scanned_at'))
+    )
+    db.session.execute(stmt, [
+        {'participant_id': participant_id, 'scanned_at': checkin_times[participant_id]}
+        for participant_id in winners
+    ])
+
+    newly_checked_in = [by_id[participant_id] for participant_id in winners if not by_id[participant_id].checked_in]
+    adjust_event_counters(
+        event_id,
+        checked_in=len(newly_checked_in),
+        eligible_for_certificates=sum(1 for row in newly_checked_in if not row.has_certificate)
+    )
+    for participant_id in winners:
+        queue_live_update(db.session, event_id, participant_id, True, checkin_times[participant_id])
+        queue_ticket_update(db.session, event_id, by_id[participant_id].ticket_number, True, checkin_times[participant_id])
+
+
+def export_ticket_set(event_id, include_names=False):
+    """Get an event's tickets in a compact form for offline validation.
+
+    Ticket numbers share the event prefix, so only their suffix is listed;
+    each row is [suffix, participant_id, checked_in] (plus name if asked).
+    """
+    columns = [Participant.ticket_number, Participant.id, Participant.checked_in]
+    if include_names:
+        columns.append(Participant.name)
+
+    rows = db.session.execute(
+        db.select(*columns).where(Participant.event_id == event_id).order_by(Participant.ticket_number)
+    ).all()
+
+    ticket_numbers = [row.ticket_number for row in rows]
+    prefix = ticket_numbers[0].rsplit('-', 1)[0] + '-' if ticket_numbers else ''
+    if not all(ticket_number.startswith(prefix) for ticket_number in ticket_numbers):
+        prefix = ''
+
+    tickets = []
+    for row in rows:
+        ticket = [row.ticket_number[len(prefix):], row.id, 1 if row.checked_in else 0]
+        if include_names:
+            ticket.append(row.name)
+        tickets.append(ticket)
+
+    fields = ['ticket', 'participant_id', 'checked_in'] + (['name'] if include_names else [])
+    return {'event_id': event_id, 'prefix': prefix, 'fields': fields, 'tickets': tickets}
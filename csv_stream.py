@@ -0,0 +1,87 @@
+"""
+Incremental decoding of uploaded CSV files for the Event Ticketing System.
+Detects the encoding from the first block of bytes and yields decoded lines
+lazily, so csv readers never need the whole upload in memory.
+"""
+
+import codecs
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Bytes read from the upload per decoding step
+CSV_READ_BLOCK_SIZE = 64 * 1024
+
+
+def sniff_csv_encoding(head):
+    """Pick a text encoding from the first bytes of an upload.
+
+    Byte order marks win; otherwise the block must decode as UTF-8, with
+    ISO-8859-1 as the fallback for legacy spreadsheet exports.
+    """
+    # Handle BOM (Byte Order Mark) that Excel and other editors add
+    if head.startswith(codecs.BOM_UTF8):
+        logger.info("Detected UTF-8 BOM in CSV file")
+        return 'utf-8-sig'
+    if head.startswith(codecs.BOM_UTF16_LE) or head.startswith(codecs.BOM_UTF16_BE):
+        # The utf-16 codec reads the BOM to pick the byte order and drops it
+        logger.info("Detected UTF-16 BOM in CSV file")
+        return 'utf-16'
+
+    try:
+        # final=False tolerates a multi-byte character cut at the block edge
+        codecs.getincrementaldecoder('utf-8')().decode(head, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        logger.info("CSV file is not UTF-8, falling back to ISO-8859-1")
+        return 'iso-8859-1'
+
+
+def iter_csv_lines(stream, block_size=CSV_READ_BLOCK_SIZE):
+    """Yield decoded lines from a binary stream, one block at a time.
+
+    Line endings are normalized like universal newlines mode (\\r\\n and \\r
+    become \\n) and every yielded line keeps its trailing newline, which is
+    what ``csv.reader`` expects for quoted fields spanning lines.
+    """
+    # The first read must be long enough to hold any byte order mark
+    block = stream.read(max(block_size, 4))
+    encoding = sniff_csv_encoding(block)
+    decoder = codecs.getincrementaldecoder(encoding)()
+    partial = ''
+    carry = ''
+
+    while True:
+        final = not block
+        try:
+            decoded = decoder.decode(block, final=final)
+        except UnicodeDecodeError:
+            if encoding != 'utf-8':
+                raise
+            # Non-UTF-8 bytes past the sniffed block: decode the rest as ISO-8859-1,
+            # including any partial character the UTF-8 decoder was holding back
+            logger.info("CSV file is not UTF-8, falling back to ISO-8859-1")
+            held_back = decoder.getstate()[0]
+            encoding = 'iso-8859-1'
+            decoder = codecs.getincrementaldecoder(encoding)()
+            decoded = decoder.decode(held_back + block, final=final)
+
+        text = carry + decoded
+
+        # A \r at the end of a block may be the first half of \r\n
+        if not final and text.endswith('\r'):
+            text, carry = text[:-1], '\r'
+        else:
+            carry = ''
+
+        lines = (partial + text.replace('\r\n', '\n').replace('\r', '\n')).split('\n')
+        partial = lines.pop()
+        for line in lines:
+            yield line + '\n'
+
+        if final:
+            if partial:
+                yield partial
+            return
+
+        block = stream.read(block_size)
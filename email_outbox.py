@@ -0,0 +1,415 @@
+"""
+Durable outbound email queue for the Event Ticketing System.
+Bulk routes store one outbox row per message and return at once; a worker
+drains the outbox over a small pool of batched SMTP connections and retries
+failures with backoff, so sends survive request timeouts and process
+restarts.
+"""
+
+import os
+import uuid
+import socket
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from models import db
+from mailer import BatchMailer, EmailQuotaExceeded, is_permanent_error
+
+logger = logging.getLogger(__name__)
+
+# Messages claimed and sent per SMTP connection
+OUTBOX_BATCH_SIZE = 50
+
+# Failed messages are retried this many times in total before giving up;
+# undeliverable messages and permanent 5xx replies are not retried
+OUTBOX_MAX_ATTEMPTS = 5
+
+# Delay before the first retry; it doubles with every further attempt
+OUTBOX_RETRY_BASE_SECONDS = 60
+
+# Messages are held back this long after the server reports a sending quota
+OUTBOX_QUOTA_BACKOFF_SECONDS = 15 * 60
+
+# While messages wait for a retry, the in-process drainer checks the outbox at least this often
+OUTBOX_IDLE_POLL_SECONDS = 30
+
+# SMTP connections used in parallel by one worker; MAIL_SEND_CONNECTIONS overrides it
+OUTBOX_SEND_CONNECTIONS = 4
+
+# A message claimed this long ago without being finished is claimed again
+OUTBOX_STALE_SECONDS = 300
+
+EMAIL_KIND_TICKET = 'ticket'
+EMAIL_KIND_CERTIFICATE = 'certificate'
+
+OUTBOX_STATUSES = ['pending', 'sending', 'sent', 'failed']
+
+
+class UndeliverableEmail(Exception):
+    """The message an outbox row refers to can no longer be built; retrying will not help."""
+
+
+class EmailOutbox(db.Model):
+    """One queued email; the message is rebuilt from the participant when sent."""
+    __tablename__ = 'email_outbox'
+
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.Integer, db.ForeignKey('events.id'), nullable=False)
+    participant_id = db.Column(db.Integer, nullable=False)  # Payload reference; the row outlives a deleted participant
+    kind = db.Column(db.String(20), nullable=False)  # ticket, certificate
+    recipient = db.Column(db.String(120), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, sending, sent, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.Text)
+    worker_id = db.Column(db.String(100))
+    locked_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_email_outbox_due', 'status', 'next_attempt_at'),
+        db.Index('ix_email_outbox_event', 'event_id', 'kind', 'status')
+    )
+
+    def __repr__(self):
+        return f'<EmailOutbox {self.id} {self.kind} to {self.recipient} {self.status}>'
+
+    def to_dict(self):
+        """Get the queued message as a JSON-serializable dictionary."""
+        return {
+            'id': self.id,
+            'event_id': self.event_id,
+            'participant_id': self.participant_id,
+            'kind': self.kind,
+            'recipient': self.recipient,
+            'status': self.status,
+            'attempts': self.attempts,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'last_error': self.last_error,
+            'sent_at': self.sent_at.isoformat() if self.sent_at else None
+        }
+
+
+def enqueue_emails(event_id, kind, recipients):
+    """Queue one email per (participant_id, email) pair with a single bulk INSERT.
+
+    Participants that already have an unsent message of this kind are
+    skipped, so pressing a send button twice does not send twice. The
+    caller commits. Returns the number of messages queued.
+    """
+    waiting = {
+        participant_id for (participant_id,) in db.session.query(EmailOutbox.participant_id).filter(
+            EmailOutbox.event_id == event_id,
+            EmailOutbox.kind == kind,
+            EmailOutbox.status.in_(['pending', 'sending'])
+        )
+    }
+
+    now = datetime.utcnow()
+    mappings = []
+    for participant_id, email in recipients:
+        if participant_id in waiting:
+            continue
+        waiting.add(participant_id)
+        mappings.append({
+            'event_id': event_id,
+            'participant_id': participant_id,
+            'kind': kind,
+            'recipient': email,
+            'status': 'pending',
+            'attempts': 0,
+            'next_attempt_at': now,
+            'created_at': now
+        })
+
+    if mappings:
+        db.session.execute(db.insert(EmailOutbox), mappings)
+    logger.info(f"Queued {len(mappings)} {kind} email(s) for event {event_id}")
+    return len(mappings)
+
+
+def outbox_status(event_id, kind=None):
+    """Count an event's queued messages per status with one grouped query."""
+    query = db.session.query(EmailOutbox.status, db.func.count(EmailOutbox.id)).filter(EmailOutbox.event_id == event_id)
+    if kind:
+        query = query.filter(EmailOutbox.kind == kind)
+    counts = dict.fromkeys(OUTBOX_STATUSES, 0)
+    counts.update(query.group_by(EmailOutbox.status).all())
+    return counts
+
+
+def next_outbox_wakeup():
+    """Seconds until the next waiting message is due, or None when nothing waits.
+
+    Counts pending messages, including ones backed off or deferred, and
+    messages whose claim will go stale because their worker stopped.
+    """
+    next_attempt_at, oldest_lock = db.session.query(
+        db.func.min(db.case((EmailOutbox.status == 'pending', EmailOutbox.next_attempt_at))),
+        db.func.min(db.case((EmailOutbox.status == 'sending', EmailOutbox.locked_at)))
+    ).filter(EmailOutbox.status.in_(['pending', 'sending'])).one()
+
+    due_times = []
+    if next_attempt_at:
+        due_times.append(next_attempt_at)
+    if oldest_lock:
+        due_times.append(oldest_lock + timedelta(seconds=OUTBOX_STALE_SECONDS))
+    if not due_times:
+        return None
+    return max((min(due_times) - datetime.utcnow()).total_seconds(), 0.0)
+
+
+def _default_worker_id():
+    # Thread idents are reused, so each batch also gets a random suffix
+    return f"{socket.gethostname()}-{os.getpid()}-{threading.get_ident()}-{uuid.uuid4().hex[:8]}"
+
+
+def _due(now):
+    stale_before = now - timedelta(seconds=OUTBOX_STALE_SECONDS)
+    return db.or_(
+        db.and_(EmailOutbox.status == 'pending', EmailOutbox.next_attempt_at <= now),
+        db.and_(EmailOutbox.status == 'sending', EmailOutbox.locked_at < stale_before)
+    )
+
+
+def claim_outbox_batch(worker_id, limit=OUTBOX_BATCH_SIZE):
+    """Atomically claim due messages, including ones abandoned by a stopped worker."""
+    now = datetime.utcnow()
+    ids = [
+        outbox_id for (outbox_id,) in db.session.execute(
+            db.select(EmailOutbox.id)
+            .where(_due(now))
+            .order_by(EmailOutbox.next_attempt_at, EmailOutbox.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+    ]
+    if not ids:
+        db.session.commit()
+        return []
+
+    db.session.execute(
+        db.update(EmailOutbox)
+        .where(EmailOutbox.id.in_(ids), _due(now))
+        .values(status='sending', worker_id=worker_id, locked_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+    # Rows another worker claimed between the SELECT and the UPDATE carry its worker id
+    return EmailOutbox.query.filter(
+        EmailOutbox.id.in_(ids),
+        EmailOutbox.status == 'sending',
+        EmailOutbox.worker_id == worker_id,
+        EmailOutbox.locked_at == now
+    ).order_by(EmailOutbox.id).all()
+
+
+def _renew_claim(outbox_id, worker_id):
+    """Refresh the claim on a message right before sending it.
+
+    A batch sent slowly (throttled rate, large attachments, retries) can
+    outlive OUTBOX_STALE_SECONDS, after which another worker may claim its
+    remaining rows. Returns False when this worker no longer owns the row.
+    """
+    result = db.session.execute(
+        db.update(EmailOutbox)
+        .where(EmailOutbox.id == outbox_id, EmailOutbox.worker_id == worker_id, EmailOutbox.status == 'sending')
+        .values(locked_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def _record_failure(outbox_id, worker_id, error):
+    entry = db.session.get(EmailOutbox, outbox_id)
+    if entry is None or entry.worker_id != worker_id or entry.status != 'sending':
+        # Another worker took the message over; its outcome is not ours to record
+        db.session.rollback()
+        return 'reclaimed'
+    entry.attempts += 1
+    entry.last_error = str(error)[:1000]
+    if (isinstance(error, UndeliverableEmail) or is_permanent_error(error)
+            or entry.attempts >= OUTBOX_MAX_ATTEMPTS):
+        entry.status = 'failed'
+        logger.error(f"Giving up on outbox email {entry.id} to {entry.recipient}: {str(error)}")
+    else:
+        entry.status = 'pending'
+        entry.next_attempt_at = datetime.utcnow() + timedelta(seconds=OUTBOX_RETRY_BASE_SECONDS * 2 ** (entry.attempts - 1))
+        logger.warning(f"Outbox email {entry.id} to {entry.recipient} failed (attempt {entry.attempts}), retrying at {entry.next_attempt_at}")
+    db.session.commit()
+    return entry.status
+
+
+def _defer(outbox_ids, worker_id, seconds, error):
+    """Hand claimed messages back to the queue without counting an attempt."""
+    db.session.execute(
+        db.update(EmailOutbox)
+        .where(EmailOutbox.id.in_(outbox_ids), EmailOutbox.status == 'sending', EmailOutbox.worker_id == worker_id)
+        .values(status='pending', next_attempt_at=datetime.utcnow() + timedelta(seconds=seconds), last_error=str(error)[:1000])
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+
+def _send_entries(mail, deliver, worker_id, entry_ids, quota_reached):
+    """Send claimed messages in order over one SMTP connection.
+
+    Returns (outbox_id, outcome) pairs in the order of entry_ids, where the
+    outcome is 'sent', 'pending' (retried later), 'failed', 'deferred' or
+    'reclaimed' (claimed by another worker in the meantime, so not sent).
+    Setting quota_reached makes every connection of the batch stop.
+    """
+    mailer = BatchMailer(mail)
+    try:
+        mailer.open()
+    except Exception as e:
+        # Not the messages' fault: retry them later without counting an attempt
+        logger.error(f"Email connection failed, deferring {len(entry_ids)} outbox email(s): {str(e)}")
+        _defer(entry_ids, worker_id, OUTBOX_RETRY_BASE_SECONDS, e)
+        return [(outbox_id, 'deferred') for outbox_id in entry_ids]
+
+    results = []
+    try:
+        for index, outbox_id in enumerate(entry_ids):
+            if quota_reached.is_set():
+                _defer(entry_ids[index:], worker_id, OUTBOX_QUOTA_BACKOFF_SECONDS, 'Email quota reached')
+                results.extend((remaining_id, 'deferred') for remaining_id in entry_ids[index:])
+                break
+
+            if not _renew_claim(outbox_id, worker_id):
+                logger.warning(f"Outbox email {outbox_id} was claimed by another worker, skipping it")
+                results.append((outbox_id, 'reclaimed'))
+                continue
+
+            entry = db.session.get(EmailOutbox, outbox_id)
+            try:
+                entry.status = 'sent'
+                entry.attempts += 1
+                entry.sent_at = datetime.utcnow()
+                entry.last_error = None
+                # Flush at the sender's commit, so the write lock is not held while the message is sent
+                with db.session.no_autoflush:
+                    deliver(entry, mailer)
+                db.session.commit()
+                results.append((outbox_id, 'sent'))
+
+            except EmailQuotaExceeded as e:
+                # The provider refuses everything for a while; put the rest of the batch back
+                db.session.rollback()
+                quota_reached.set()
+                logger.error(f"Email quota reached, deferring {len(entry_ids) - index} outbox email(s)")
+                _defer(entry_ids[index:], worker_id, OUTBOX_QUOTA_BACKOFF_SECONDS, e)
+                results.extend((remaining_id, 'deferred') for remaining_id in entry_ids[index:])
+                break
+
+            except Exception as e:
+                db.session.rollback()
+                results.append((outbox_id, _record_failure(outbox_id, worker_id, e)))
+    finally:
+        mailer.close()
+    return results
+
+
+def process_outbox_batch(mail, deliver, worker_id=None, batch_size=OUTBOX_BATCH_SIZE, connections=None):
+    """Claim due messages and send them over a pool of SMTP connections.
+
+    Up to batch_size messages are claimed per connection and split into
+    contiguous slices, one per connection, each sent by its own thread
+    with its own app context and database session. All connections share
+    the mailer's adaptive rate limiter, so the configured rate stays the
+    limit for the whole worker. ``deliver(entry, mailer)`` builds and
+    sends the message of one outbox row. The row is marked sent before
+    delivery so that the commit made by the sender records both the
+    message and its outbox row; a failed send rolls both back. Returns the
+    number of messages handled, 0 when none were due.
+    """
+    worker_id = worker_id or _default_worker_id()
+    app = current_app._get_current_object()
+    if connections is None:
+        connections = app.config.get('MAIL_SEND_CONNECTIONS', OUTBOX_SEND_CONNECTIONS)
+    connections = max(int(connections), 1)
+
+    entries = claim_outbox_batch(worker_id, batch_size * connections)
+    if not entries:
+        return 0
+
+    entry_ids = [entry.id for entry in entries]
+    per_connection = -(-len(entry_ids) // connections)
+    slices = [entry_ids[i:i + per_connection] for i in range(0, len(entry_ids), per_connection)]
+    quota_reached = threading.Event()
+
+    if len(slices) == 1:
+        results = _send_entries(mail, deliver, worker_id, entry_ids, quota_reached)
+    else:
+        def send_slice(slice_ids):
+            with app.app_context():
+                return _send_entries(mail, deliver, worker_id, slice_ids, quota_reached)
+
+        # map() yields each slice's results in submission order, so results follow entry_ids
+        with ThreadPoolExecutor(max_workers=len(slices), thread_name_prefix='email-sender') as executor:
+            results = [result for slice_results in executor.map(send_slice, slices) for result in slice_results]
+
+    outcomes = {}
+    for _, outcome in results:
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    logger.info(f"Worker {worker_id} handled {len(entry_ids)} outbox email(s) over {len(slices)} connection(s): {outcomes}")
+    return len(entry_ids)
+
+
+def drain_outbox(mail, deliver, worker_id=None):
+    """Send batches until no message is due. Returns the number of messages handled."""
+    handled = 0
+    while True:
+        count = process_outbox_batch(mail, deliver, worker_id)
+        if not count:
+            return handled
+        handled += count
+
+
+_drain_lock = threading.Lock()
+_drain_wake = threading.Event()
+
+
+def start_outbox_thread(app, mail, deliver):
+    """Drain the outbox in a background thread of this process, unless one is already running.
+
+    The thread stays alive while messages wait for a retry, a quota
+    deferral or a stale claim, sleeping until the earliest one is due.
+    Calling this while the thread runs wakes it up for newly queued mail.
+    """
+    if not _drain_lock.acquire(blocking=False):
+        _drain_wake.set()
+        return None
+
+    def run():
+        try:
+            with app.app_context():
+                while True:
+                    _drain_wake.clear()
+                    drain_outbox(mail, deliver)
+                    wait = next_outbox_wakeup()
+                    # Do not hold a connection while sleeping
+                    db.session.remove()
+                    if wait is None:
+                        if not _drain_wake.is_set():
+                            break
+                        continue
+                    # Due rows may be locked by another worker; do not spin on them
+                    _drain_wake.wait(min(max(wait, 1.0), OUTBOX_IDLE_POLL_SECONDS))
+        except Exception as e:
+            logger.error(f"Email outbox thread stopped: {str(e)}")
+        finally:
+            _drain_lock.release()
+
+        # Mail queued while the thread was shutting down found the lock still taken
+        if _drain_wake.is_set():
+            start_outbox_thread(app, mail, deliver)
+
+    thread = threading.Thread(target=run, name='email-outbox', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Worker process for the email outbox.
+Sends queued ticket and certificate emails over batched SMTP connections
+and retries failed messages with backoff. Run it with
+EMAIL_OUTBOX_RUN_IN_THREAD=False on the web process, and set SERVER_NAME
+so links in emails can be built outside a request.
+"""
+
+import sys
+import time
+from app import app, mail, deliver_outbox_email
+from email_outbox import process_outbox_batch
+from mailer import send_rate_limiter
+
+POLL_INTERVAL_SECONDS = 5
+
+
+def run_due_emails():
+    """Send every email that is due once. Returns the number handled."""
+    handled = 0
+    with app.app_context():
+        while True:
+            count = process_outbox_batch(mail, deliver_outbox_email)
+            if not count:
+                break
+            print(f"📧 Handled a batch of {count} email(s), sending at {send_rate_limiter.current_rate:.2f}/s")
+            handled += count
+    return handled
+
+
+def main():
+    run_once = '--once' in sys.argv
+    print("🚀 Email worker started")
+
+    while True:
+        handled = run_due_emails()
+        if run_once:
+            print(f"🎉 Handled {handled} queued email(s)")
+            break
+        if not handled:
+            time.sleep(POLL_INTERVAL_SECONDS)
+
+
+if __name__ == '__main__':
+    main()
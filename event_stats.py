@@ -0,0 +1,382 @@
+"""
+Event statistics for the Event Ticketing System.
+Computes dashboard counters with grouped SQL aggregates instead of loading
+every participant and its certificate into Python, and keeps a per-event
+counters row up to date from every write so dashboards read a single row.
+"""
+
+import logging
+from collections import Counter, defaultdict
+from datetime import datetime
+from sqlalchemy import event as sa_event, inspect
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from models import db, Event, Participant, Certificate
+
+logger = logging.getLogger(__name__)
+
+# Counters returned for every event, in the order they are selected
+STAT_FIELDS = [
+    'total_participants',
+    'checked_in',
+    'emails_sent',
+    'certificates_issued',
+    'certificates_sent',
+    'eligible_for_certificates'
+]
+
+
+def _count_if(condition):
+    """Conditional count that works on every supported database."""
+    return db.func.coalesce(db.func.sum(db.case((condition, 1), else_=0)), 0)
+
+
+def participant_stats_query():
+    """Build the grouped statistics query over participants and certificates.
+
+    Participants are left-joined to their certificate so a single pass counts
+    attendance, emails and certificates per event.
+    """
+    return (
+        db.select(
+            Participant.event_id,
+            db.func.count(Participant.id).label('total_participants'),
+            _count_if(Participant.checked_in == True).label('checked_in'),
+            _count_if(Participant.email_sent == True).label('emails_sent'),
+            _count_if(Certificate.id.isnot(None)).label('certificates_issued'),
+            _count_if(Certificate.email_sent == True).label('certificates_sent'),
+            _count_if(db.and_(Participant.checked_in == True, Certificate.id.is_(None))).label('eligible_for_certificates')
+        )
+        .select_from(Participant)
+        .outerjoin(Certificate, Certificate.participant_id == Participant.id)
+        .group_by(Participant.event_id)
+    )
+
+
+def get_events_stats(event_ids):
+    """Get dashboard counters for several events with one query.
+
+    Returns a dictionary of event id to stats; events without participants
+    get all-zero counters.
+    """
+    event_ids = list(event_ids)
+    stats = {event_id: dict.fromkeys(STAT_FIELDS, 0) for event_id in event_ids}
+    if not event_ids:
+        return stats
+
+    rows = db.session.execute(participant_stats_query().where(Participant.event_id.in_(event_ids)))
+    for row in rows:
+        stats[row.event_id] = {field: int(getattr(row, field)) for field in STAT_FIELDS}
+
+    return stats
+
+
+def get_event_stats(event_id):
+    """Get dashboard counters for one event, including pending emails."""
+    stats = get_events_stats([event_id])[event_id]
+    stats['pending_emails'] = stats['total_participants'] - stats['emails_sent']
+    return stats
+
+
+class EventCounter(db.Model):
+    """Incrementally maintained dashboard counters of one event."""
+    __tablename__ = 'event_counters'
+
+    event_id = db.Column(db.Integer, db.ForeignKey('events.id'), primary_key=True)
+    total_participants = db.Column(db.Integer, nullable=False, default=0)
+    checked_in = db.Column(db.Integer, nullable=False, default=0)
+    emails_sent = db.Column(db.Integer, nullable=False, default=0)
+    certificates_issued = db.Column(db.Integer, nullable=False, default=0)
+    certificates_sent = db.Column(db.Integer, nullable=False, default=0)
+    eligible_for_certificates = db.Column(db.Integer, nullable=False, default=0)
+    version = db.Column(db.Integer, nullable=False, default=1)  # Bumped by every change to the event's data
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<EventCounter event={self.event_id} total={self.total_participants}>'
+
+    def to_dict(self):
+        """Get the counters in the same shape as get_event_stats(), plus the version stamp."""
+        stats = {field: getattr(self, field) for field in STAT_FIELDS}
+        stats['pending_emails'] = stats['total_participants'] - stats['emails_sent']
+        stats['version'] = self.version
+        stats['updated_at'] = self.updated_at
+        return stats
+
+
+def adjust_event_counters(event_id, connection=None, **deltas):
+    """Apply counter deltas to an event's counters row in the current transaction.
+
+    Every call also bumps the event's version stamp, even without deltas.
+    Write paths that bypass the ORM (bulk INSERT/UPDATE statements) call this
+    directly. Every event gets its counters row when it is created, and
+    older events get theirs from seed_event_counters() at startup, so the
+    UPDATE always finds a row.
+    """
+    values = {field: getattr(EventCounter, field) + delta for field, delta in deltas.items() if delta}
+    values['version'] = EventCounter.version + 1
+    values['updated_at'] = datetime.utcnow()
+    stmt = db.update(EventCounter).where(EventCounter.event_id == event_id).values(**values)
+
+    if connection is not None:
+        connection.execute(stmt)
+    else:
+        db.session.execute(stmt.execution_options(synchronize_session=False))
+
+
+def _committed_value(obj, attr):
+    """Value of a column attribute as last loaded from the database."""
+    history = inspect(obj).attrs[attr].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return None
+
+
+def _flag_delta(obj, attr):
+    """Change of a boolean column in this flush as -1, 0 or 1."""
+    if not inspect(obj).attrs[attr].history.has_changes():
+        return 0
+    return int(bool(getattr(obj, attr))) - int(bool(_committed_value(obj, attr)))
+
+
+def _had_certificate(participant):
+    """Whether the participant had a certificate before this flush."""
+    history = inspect(participant).attrs.certificate.load_history()
+    previous = (history.deleted or history.unchanged or [None])[0]
+    # A certificate deleted by an earlier flush of this transaction no longer counts
+    return previous is not None and not inspect(previous).was_deleted
+
+
+def _participant_event_id(participant):
+    return participant.event_id or (participant.event.id if participant.event else None)
+
+
+def _collect_counter_deltas(session):
+    """Compute counter deltas for the participants and certificates being flushed.
+
+    Eligibility is ``checked_in and not has_certificate``; its delta is split
+    so participant changes use the certificate state before the flush and
+    certificate changes use the participant's check-in state after it.
+    """
+    deltas = defaultdict(Counter)
+    deleted_event_ids = {obj.id for obj in session.deleted if isinstance(obj, Event)}
+
+    # Any change to an event, its participants or certificates bumps the version
+    for obj in session.dirty:
+        if isinstance(obj, Event) and session.is_modified(obj):
+            deltas.setdefault(obj.id, Counter())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Participant):
+            deltas.setdefault(_participant_event_id(obj), Counter())
+        elif isinstance(obj, Certificate):
+            participant = obj.participant or session.get(Participant, obj.participant_id)
+            if participant is not None:
+                deltas.setdefault(_participant_event_id(participant), Counter())
+
+    for participant in session.new:
+        if isinstance(participant, Participant):
+            checked_in = int(bool(participant.checked_in))
+            deltas[_participant_event_id(participant)].update(
+                total_participants=1,
+                checked_in=checked_in,
+                emails_sent=int(bool(participant.email_sent)),
+                eligible_for_certificates=checked_in
+            )
+
+    for participant in session.deleted:
+        # Participants removed with their whole event take the counters row with them
+        if isinstance(participant, Participant) and participant.event_id not in deleted_event_ids:
+            checked_in = int(bool(_committed_value(participant, 'checked_in')))
+            deltas[participant.event_id].subtract(
+                total_participants=1,
+                checked_in=checked_in,
+                emails_sent=int(bool(_committed_value(participant, 'email_sent'))),
+                eligible_for_certificates=checked_in * (not _had_certificate(participant))
+            )
+
+    for participant in session.dirty:
+        if isinstance(participant, Participant):
+            checked_in_delta = _flag_delta(participant, 'checked_in')
+            emails_sent_delta = _flag_delta(participant, 'email_sent')
+            if checked_in_delta or emails_sent_delta:
+                deltas[participant.event_id].update(
+                    checked_in=checked_in_delta,
+                    emails_sent=emails_sent_delta,
+                    eligible_for_certificates=checked_in_delta * (not _had_certificate(participant))
+                )
+
+    def certificate_change(certificate, issued, sent):
+        participant = certificate.participant or session.get(Participant, certificate.participant_id)
+        if participant is None:
+            return
+        checked_in_after = participant not in session.deleted and bool(participant.checked_in)
+        deltas[_participant_event_id(participant)].update(
+            certificates_issued=issued,
+            certificates_sent=sent,
+            eligible_for_certificates=-issued * int(checked_in_after)
+        )
+
+    for certificate in session.new:
+        if isinstance(certificate, Certificate):
+            certificate_change(certificate, 1, int(bool(certificate.email_sent)))
+
+    for certificate in session.deleted:
+        if isinstance(certificate, Certificate):
+            certificate_change(certificate, -1, -int(bool(_committed_value(certificate, 'email_sent'))))
+
+    for certificate in session.dirty:
+        if isinstance(certificate, Certificate):
+            sent_delta = _flag_delta(certificate, 'email_sent')
+            if sent_delta:
+                certificate_change(certificate, 0, sent_delta)
+
+    return deltas
+
+
+@sa_event.listens_for(Session, 'before_flush')
+def _maintain_event_counters(session, flush_context, instances):
+    """Keep event_counters in step with ORM writes, inside the same transaction."""
+    deltas = _collect_counter_deltas(session)
+    if not deltas:
+        return
+
+    connection = session.connection()
+    deleted_event_ids = {obj.id for obj in session.deleted if isinstance(obj, Event)}
+    for event_id, event_deltas in deltas.items():
+        if event_id is not None and event_id not in deleted_event_ids:
+            adjust_event_counters(event_id, connection=connection, **event_deltas)
+
+
+@sa_event.listens_for(Session, 'after_flush')
+def _create_event_counters(session, flush_context):
+    """Create the counters row of new events in the transaction that creates them."""
+    new_event_ids = [obj.id for obj in session.new if isinstance(obj, Event)]
+    if not new_event_ids:
+        return
+
+    # Participants flushed with the event carried no event id when their deltas were collected
+    connection = session.connection()
+    stats = {event_id: dict.fromkeys(STAT_FIELDS, 0) for event_id in new_event_ids}
+    for row in connection.execute(participant_stats_query().where(Participant.event_id.in_(new_event_ids))):
+        stats[row.event_id] = {field: int(getattr(row, field)) for field in STAT_FIELDS}
+
+    now = datetime.utcnow()
+    connection.execute(
+        db.insert(EventCounter),
+        [dict(values, event_id=event_id, version=1, updated_at=now) for event_id, values in stats.items()]
+    )
+
+
+def _upsert_counters(event_id, stats, overwrite):
+    values = {field: stats[field] for field in STAT_FIELDS}
+    values['updated_at'] = datetime.utcnow()
+    dialect_name = db.session.get_bind().dialect.name
+
+    if dialect_name in ('postgresql', 'sqlite'):
+        insert = postgresql.insert if dialect_name == 'postgresql' else sqlite.insert
+        stmt = insert(EventCounter).values(event_id=event_id, **values)
+        if overwrite:
+            stmt = stmt.on_conflict_do_update(index_elements=['event_id'],
+                                              set_=dict(values, version=EventCounter.version + 1))
+        else:
+            stmt = stmt.on_conflict_do_nothing()
+        db.session.execute(stmt)
+        return
+
+    counter = db.session.get(EventCounter, event_id)
+    if counter is None:
+        db.session.add(EventCounter(event_id=event_id, **values))
+    elif overwrite:
+        for field, value in values.items():
+            setattr(counter, field, value)
+        counter.version += 1
+
+
+def get_events_counters(event_ids):
+    """Get maintained counters for several events, seeding missing rows.
+
+    Returns a dictionary of event id to the same stats as get_event_stats().
+    """
+    event_ids = list(event_ids)
+    counters = {
+        counter.event_id: counter
+        for counter in EventCounter.query.filter(EventCounter.event_id.in_(event_ids))
+    } if event_ids else {}
+
+    missing = [event_id for event_id in event_ids if event_id not in counters]
+    if missing:
+        _seed_counters(missing)
+        counters.update({
+            counter.event_id: counter
+            for counter in EventCounter.query.filter(EventCounter.event_id.in_(missing))
+        })
+        logger.info(f"Seeded event counters for events {missing}")
+
+    return {event_id: counters[event_id].to_dict() for event_id in event_ids}
+
+
+def _seed_counters(event_ids):
+    """Create counters rows for events that lack one without losing concurrent writes.
+
+    Zero rows are committed first, so writes from then on apply their
+    deltas to them. The rows are then locked with a version bump, which
+    waits for writers holding them, before the aggregate overwrites them
+    in the same transaction.
+    """
+    for event_id in event_ids:
+        _upsert_counters(event_id, dict.fromkeys(STAT_FIELDS, 0), overwrite=False)
+    db.session.commit()
+
+    for event_id in event_ids:
+        adjust_event_counters(event_id)
+    for event_id, stats in get_events_stats(event_ids).items():
+        _upsert_counters(event_id, stats, overwrite=True)
+    db.session.commit()
+
+
+def seed_event_counters():
+    """Create counters rows for events that predate the event_counters table.
+
+    Run at startup, so rows are not first created while dashboards are
+    read during imports or scan bursts. Returns the ids of seeded events.
+    """
+    missing = [
+        event_id for (event_id,) in db.session.query(Event.id)
+        .outerjoin(EventCounter, EventCounter.event_id == Event.id)
+        .filter(EventCounter.event_id.is_(None))
+    ]
+    if missing:
+        _seed_counters(missing)
+        logger.info(f"Seeded event counters for {len(missing)} events")
+    return missing
+
+
+def get_event_counters(event_id):
+    """Get the maintained dashboard counters of one event."""
+    return get_events_counters([event_id])[event_id]
+
+
+def rebuild_event_counters(event_ids=None):
+    """Recompute counters from the participants and certificates tables.
+
+    Rebuilds every event when ``event_ids`` is None. Returns a dictionary of
+    event id to (old stats or None, new stats) for events that changed.
+    """
+    if event_ids is None:
+        event_ids = [event_id for (event_id,) in db.session.query(Event.id)]
+
+    previous = {
+        counter.event_id: {field: getattr(counter, field) for field in STAT_FIELDS}
+        for counter in EventCounter.query.filter(EventCounter.event_id.in_(event_ids))
+    } if event_ids else {}
+
+    changed = {}
+    for event_id, stats in get_events_stats(event_ids).items():
+        if previous.get(event_id) != stats:
+            changed[event_id] = (previous.get(event_id), stats)
+        _upsert_counters(event_id, stats, overwrite=True)
+
+    db.session.commit()
+    return changed
@@ -0,0 +1,272 @@
+"""
+Attendance exports for the Event Ticketing System.
+Streams participant rows from a server-side cursor straight into the
+response as CSV, JSON Lines or a write-only XLSX workbook, so large events
+export in bounded memory, and builds cross-event reports from grouped
+aggregates.
+"""
+
+import io
+import csv
+import json
+import tempfile
+from datetime import timedelta
+from openpyxl import Workbook
+from models import db, Event, Participant, Certificate
+from event_stats import participant_stats_query
+
+# Rows fetched from the database cursor per round trip
+EXPORT_BATCH_SIZE = 1000
+
+# Approximate bytes of encoded output buffered before each chunk is sent
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+ATTENDANCE_HEADER = ['Name', 'Email', 'Ticket Number', 'Checked In', 'Check-in Time']
+
+# (key, header) of the detailed XLSX and JSON Lines exports
+DETAILED_FIELDS = [
+    ('name', 'Name'),
+    ('email', 'Email'),
+    ('ticket_number', 'Ticket Number'),
+    ('checked_in', 'Checked In'),
+    ('checkin_time', 'Check-in Time'),
+    ('email_sent', 'Email Sent'),
+    ('email_sent_at', 'Email Sent At'),
+    ('certificate_number', 'Certificate Number'),
+    ('certificate_issued_date', 'Certificate Issued'),
+    ('certificate_email_sent', 'Certificate Sent')
+]
+
+BOOLEAN_FIELDS = {'checked_in', 'email_sent', 'certificate_email_sent'}
+
+
+def attendance_rows(event_id, batch_size=EXPORT_BATCH_SIZE):
+    """Yield an event's attendance rows, fetched in batches with ``yield_per``."""
+    stmt = (
+        db.select(Participant.name, Participant.email, Participant.ticket_number,
+                  Participant.checked_in, Participant.checkin_time)
+        .where(Participant.event_id == event_id)
+        .order_by(Participant.id)
+        .execution_options(yield_per=batch_size)
+    )
+    for row in db.session.execute(stmt):
+        yield [
+            row.name,
+            row.email,
+            row.ticket_number,
+            'Yes' if row.checked_in else 'No',
+            row.checkin_time.strftime('%Y-%m-%d %H:%M:%S') if row.checkin_time else ''
+        ]
+
+
+def stream_attendance_csv(event_id, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield an event's attendance report as CSV text in chunks of about chunk_size."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(ATTENDANCE_HEADER)
+
+    for row in attendance_rows(event_id):
+        writer.writerow(row)
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+def attendance_records(event_id, batch_size=EXPORT_BATCH_SIZE):
+    """Yield an event's detailed attendance rows, keyed like DETAILED_FIELDS."""
+    stmt = (
+        db.select(
+            Participant.name, Participant.email, Participant.ticket_number,
+            Participant.checked_in, Participant.checkin_time,
+            Participant.email_sent, Participant.email_sent_at,
+            Certificate.certificate_number,
+            Certificate.issued_date.label('certificate_issued_date'),
+            Certificate.email_sent.label('certificate_email_sent')
+        )
+        .outerjoin(Certificate, Certificate.participant_id == Participant.id)
+        .where(Participant.event_id == event_id)
+        .order_by(Participant.id)
+        .execution_options(yield_per=batch_size)
+    )
+    for row in db.session.execute(stmt):
+        yield row._mapping
+
+
+def _json_value(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def stream_attendance_jsonl(event_id, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield an event's detailed attendance as JSON Lines, one object per participant."""
+    buffer = io.StringIO()
+    for record in attendance_records(event_id):
+        document = {}
+        for key, _ in DETAILED_FIELDS:
+            value = record[key]
+            document[key] = bool(value) if key in BOOLEAN_FIELDS and value is not None else _json_value(value)
+        buffer.write(json.dumps(document) + '\n')
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+def stream_attendance_xlsx(event_id, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield an event's detailed attendance as an XLSX file.
+
+    openpyxl's write-only mode spools rows to disk as they are appended,
+    and the finished workbook is read back from a temporary file. The
+    download starts once every row is written, because a zip archive
+    cannot be sent before it is complete.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Attendance')
+    sheet.append([header for _, header in DETAILED_FIELDS])
+
+    for record in attendance_records(event_id):
+        values = []
+        for key, _ in DETAILED_FIELDS:
+            value = record[key]
+            if key in BOOLEAN_FIELDS:
+                value = '' if value is None else ('Yes' if value else 'No')
+            values.append(value)
+        sheet.append(values)
+
+    with tempfile.TemporaryFile() as output:
+        workbook.save(output)
+        output.seek(0)
+        while True:
+            chunk = output.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+# format -> (streaming function, mimetype)
+EXPORT_FORMATS = {
+    'csv': (stream_attendance_csv, 'text/csv'),
+    'xlsx': (stream_attendance_xlsx, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'jsonl': (stream_attendance_jsonl, 'application/x-ndjson')
+}
+
+
+# Columns of the cross-event report, in output order
+REPORT_FIELDS = [
+    'event_id', 'event_name', 'alias_name', 'date', 'registrations', 'checked_in',
+    'attendance_rate', 'emails_sent', 'certificates_issued', 'certificates_sent'
+]
+
+REPORT_COUNT_FIELDS = ['registrations', 'checked_in', 'emails_sent', 'certificates_issued', 'certificates_sent']
+
+
+def _attendance_rate(checked_in, registrations):
+    return round(100.0 * checked_in / registrations, 1) if registrations else 0.0
+
+
+def event_report_rows(event_ids=None, start_date=None, end_date=None):
+    """Yield per-event report rows from one grouped aggregate query.
+
+    Events are selected by id and/or by an inclusive date range; without
+    filters every event is reported. Events without participants are
+    included with zero counts.
+    """
+    conditions = []
+    if event_ids:
+        conditions.append(Event.id.in_(list(event_ids)))
+    if start_date:
+        conditions.append(Event.date >= start_date)
+    if end_date:
+        # Event.date is a DateTime, so include every time on the end date
+        conditions.append(Event.date < end_date + timedelta(days=1))
+
+    # Aggregate only the participants of the selected events
+    stats = participant_stats_query().where(
+        Participant.event_id.in_(db.select(Event.id).where(*conditions))
+    ).subquery()
+
+    stmt = (
+        db.select(
+            Event.id, Event.name, Event.alias_name, Event.date,
+            db.func.coalesce(stats.c.total_participants, 0).label('registrations'),
+            db.func.coalesce(stats.c.checked_in, 0).label('checked_in'),
+            db.func.coalesce(stats.c.emails_sent, 0).label('emails_sent'),
+            db.func.coalesce(stats.c.certificates_issued, 0).label('certificates_issued'),
+            db.func.coalesce(stats.c.certificates_sent, 0).label('certificates_sent')
+        )
+        .outerjoin(stats, stats.c.event_id == Event.id)
+        .where(*conditions)
+        .order_by(Event.date, Event.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+
+    for row in db.session.execute(stmt):
+        report = {
+            'event_id': row.id,
+            'event_name': row.name,
+            'alias_name': row.alias_name,
+            'date': row.date.isoformat() if row.date else None
+        }
+        report.update((field, int(getattr(row, field))) for field in REPORT_COUNT_FIELDS)
+        report['attendance_rate'] = _attendance_rate(report['checked_in'], report['registrations'])
+        yield {field: report[field] for field in REPORT_FIELDS}
+
+
+def _report_totals(totals, events):
+    return dict(
+        totals,
+        events=events,
+        attendance_rate=_attendance_rate(totals['checked_in'], totals['registrations'])
+    )
+
+
+def stream_event_report_csv(rows):
+    """Yield report rows as CSV text, ending with a totals row."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(REPORT_FIELDS)
+
+    totals = dict.fromkeys(REPORT_COUNT_FIELDS, 0)
+    events = 0
+    for row in rows:
+        writer.writerow([row[field] for field in REPORT_FIELDS])
+        events += 1
+        for field in REPORT_COUNT_FIELDS:
+            totals[field] += row[field]
+        if buffer.tell() >= EXPORT_CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    summary = _report_totals(totals, events)
+    writer.writerow(['TOTAL', f"{events} events", '', ''] + [summary[field] for field in REPORT_FIELDS[4:]])
+    yield buffer.getvalue()
+
+
+def stream_event_report_json(rows):
+    """Yield report rows as a JSON document with an events list and totals."""
+    totals = dict.fromkeys(REPORT_COUNT_FIELDS, 0)
+    events = 0
+    chunk = ['{"events": [']
+    for row in rows:
+        chunk.append((',' if events else '') + json.dumps(row))
+        events += 1
+        for field in REPORT_COUNT_FIELDS:
+            totals[field] += row[field]
+        if len(chunk) >= EXPORT_BATCH_SIZE:
+            yield ''.join(chunk)
+            chunk = []
+
+    chunk.append('], "totals": ' + json.dumps(_report_totals(totals, events)) + '}')
+    yield ''.join(chunk)
+
+
+# format -> (streaming function over report rows, mimetype)
+REPORT_FORMATS = {
+    'csv': (stream_event_report_csv, 'text/csv'),
+    'json': (stream_event_report_json, 'application/json')
+}
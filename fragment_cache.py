@@ -0,0 +1,53 @@
+"""
+In-process rendered fragment cache for the Event Ticketing System.
+Entries are tagged with the event version stamp they were rendered from, so
+a bumped version makes stale entries miss without explicit invalidation.
+"""
+
+import threading
+from collections import OrderedDict
+
+# Rendered dashboards kept per process
+DASHBOARD_CACHE_SIZE = 128
+
+
+class VersionedCache:
+    """Bounded LRU cache whose entries are only valid for one version."""
+
+    def __init__(self, max_entries=DASHBOARD_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version):
+        """Get the cached value for key if it was stored for this version."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, version, value):
+        """Store a value for key and version, evicting the least recently used entry."""
+        with self.lock:
+            self.entries[key] = (version, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def discard(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def stats(self):
+        """Get hit/miss counters and the current size."""
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self.entries)}
+
+
+dashboard_cache = VersionedCache()
@@ -0,0 +1,252 @@
+"""
+Background participant import jobs for the Event Ticketing System.
+Large uploads are persisted to disk and imported in committed chunks outside
+the HTTP request, so a restarted worker can resume from the last chunk.
+"""
+
+import os
+import json
+import uuid
+import socket
+import logging
+import threading
+from datetime import datetime, timedelta
+from itertools import islice
+from werkzeug.utils import secure_filename
+from models import db, Event
+from participant_import import (IMPORT_CHUNK_SIZE, detect_participant_columns, import_participants, load_existing_emails,
+                                read_participant_file)
+
+logger = logging.getLogger(__name__)
+
+# Folder where uploaded files wait for their import job
+IMPORT_UPLOAD_FOLDER = os.path.join('uploads', 'imports')
+
+# A running job without a heartbeat for this long is considered abandoned
+IMPORT_JOB_STALE_SECONDS = 300
+
+# Maximum number of rejected-row messages kept on a job
+MAX_STORED_ERRORS = 200
+
+
+class ImportJob(db.Model):
+    """Participant import job with resumable, chunk-level progress."""
+    __tablename__ = 'import_jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.Integer, db.ForeignKey('events.id'), nullable=False)
+    filename = db.Column(db.String(255), nullable=False)
+    file_path = db.Column(db.String(500), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, running, completed, failed
+    rows_processed = db.Column(db.Integer, nullable=False, default=0)
+    rows_added = db.Column(db.Integer, nullable=False, default=0)
+    rows_rejected = db.Column(db.Integer, nullable=False, default=0)
+    errors = db.Column(db.Text)  # JSON list of the first rejected rows
+    error_message = db.Column(db.Text)
+    worker_id = db.Column(db.String(100))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<ImportJob {self.id} event={self.event_id} {self.status}>'
+
+    def get_errors(self):
+        """Get stored rejected-row messages as a list."""
+        return json.loads(self.errors) if self.errors else []
+
+    def add_errors(self, new_errors):
+        """Append rejected-row messages, keeping at most MAX_STORED_ERRORS."""
+        stored = self.get_errors()
+        if new_errors and len(stored) < MAX_STORED_ERRORS:
+            stored.extend(new_errors[:MAX_STORED_ERRORS - len(stored)])
+            self.errors = json.dumps(stored)
+
+    @property
+    def claimable(self):
+        """Whether the job is waiting or its worker stopped sending heartbeats."""
+        if self.status == 'pending':
+            return True
+        stale_before = datetime.utcnow() - timedelta(seconds=IMPORT_JOB_STALE_SECONDS)
+        return self.status == 'running' and self.heartbeat_at is not None and self.heartbeat_at < stale_before
+
+    @property
+    def rate(self):
+        """Rows processed per second since the job started."""
+        if not self.started_at or not self.rows_processed:
+            return 0.0
+        elapsed = ((self.finished_at or datetime.utcnow()) - self.started_at).total_seconds()
+        return round(self.rows_processed / elapsed, 1) if elapsed > 0 else float(self.rows_processed)
+
+    def to_dict(self):
+        """Get job progress as a JSON-serializable dictionary."""
+        return {
+            'id': self.id,
+            'event_id': self.event_id,
+            'filename': self.filename,
+            'status': self.status,
+            'rows_processed': self.rows_processed,
+            'rows_added': self.rows_added,
+            'rows_rejected': self.rows_rejected,
+            'rate': self.rate,
+            'errors': self.get_errors(),
+            'error_message': self.error_message,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+def create_import_job(event, file):
+    """Persist an uploaded participant file and queue an import job for it."""
+    os.makedirs(IMPORT_UPLOAD_FOLDER, exist_ok=True)
+
+    filename = secure_filename(file.filename) or 'participants.csv'
+    file_path = os.path.join(IMPORT_UPLOAD_FOLDER, f"{uuid.uuid4().hex}_{filename}")
+    file.save(file_path)
+
+    job = ImportJob(event_id=event.id, filename=filename, file_path=file_path)
+    db.session.add(job)
+    db.session.commit()
+
+    logger.info(f"Queued import job {job.id} for event {event.id} ({filename})")
+    return job
+
+
+def _default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}-{threading.get_ident()}"
+
+
+def claim_import_job(job_id, worker_id):
+    """Atomically claim a pending job, or a running job whose worker went away."""
+    now = datetime.utcnow()
+    stale_before = now - timedelta(seconds=IMPORT_JOB_STALE_SECONDS)
+
+    result = db.session.execute(
+        db.update(ImportJob)
+        .where(
+            ImportJob.id == job_id,
+            db.or_(
+                ImportJob.status == 'pending',
+                db.and_(ImportJob.status == 'running', ImportJob.heartbeat_at < stale_before)
+            )
+        )
+        .values(
+            status='running',
+            worker_id=worker_id,
+            heartbeat_at=now,
+            started_at=db.func.coalesce(ImportJob.started_at, now)
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def claimable_import_job_ids():
+    """Get ids of jobs that are waiting or were abandoned by a worker."""
+    stale_before = datetime.utcnow() - timedelta(seconds=IMPORT_JOB_STALE_SECONDS)
+    rows = db.session.query(ImportJob.id).filter(
+        db.or_(
+            ImportJob.status == 'pending',
+            db.and_(ImportJob.status == 'running', ImportJob.heartbeat_at < stale_before)
+        )
+    ).order_by(ImportJob.id)
+    return [job_id for (job_id,) in rows]
+
+
+def _open_job_rows(stream, filename):
+    """Read the header of a job's file and return (rows, name_col, email_col)."""
+    reader = read_participant_file(stream, filename)
+
+    name_col, email_col = detect_participant_columns(reader.fieldnames or [])
+    if not name_col or not email_col:
+        raise ValueError(f'File format error. Expected columns: name, email. Found columns: {", ".join(reader.fieldnames or [])}')
+
+    return reader, name_col, email_col
+
+
+def process_import_job(job_id, worker_id=None, chunk_size=IMPORT_CHUNK_SIZE):
+    """Run an import job, committing participants and progress per chunk.
+
+    Rows already counted in ``rows_processed`` were committed by an earlier
+    run and are skipped, so an interrupted job resumes where it stopped.
+    Returns False when the job could not be claimed.
+    """
+    worker_id = worker_id or _default_worker_id()
+    if not claim_import_job(job_id, worker_id):
+        return False
+
+    job = db.session.get(ImportJob, job_id)
+    event = db.session.get(Event, job.event_id)
+    logger.info(f"Worker {worker_id} processing import job {job.id} from row {job.rows_processed}")
+
+    try:
+        with open(job.file_path, 'rb') as f:
+            rows, name_col, email_col = _open_job_rows(f, job.filename)
+            rows = iter(rows)
+
+            # Skip rows committed by a previous run of this job
+            next(islice(rows, job.rows_processed, job.rows_processed), None)
+
+            # Loaded once per run; it includes rows committed by a previous run
+            known_emails = load_existing_emails(event.id)
+
+            while True:
+                chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    break
+
+                added, errors = import_participants(event, chunk, name_col, email_col,
+                                                    start_row=2 + job.rows_processed,
+                                                    chunk_size=chunk_size,
+                                                    known_emails=known_emails)
+
+                job.rows_processed += len(chunk)
+                job.rows_added += added
+                job.rows_rejected += len(errors)
+                job.add_errors(errors)
+                job.heartbeat_at = datetime.utcnow()
+                db.session.commit()
+
+        job.status = 'completed'
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        logger.info(f"Import job {job.id} completed: {job.rows_added} added, {job.rows_rejected} rejected")
+
+        try:
+            os.remove(job.file_path)
+        except OSError as e:
+            logger.warning(f"Could not remove import file {job.file_path}: {e}")
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Import job {job_id} failed: {str(e)}")
+        job = db.session.get(ImportJob, job_id)
+        job.status = 'failed'
+        job.error_message = str(e)
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+
+    return True
+
+
+def start_import_thread(app, job_id):
+    """Process an import job in a background thread of this process."""
+    def run():
+        with app.app_context():
+            process_import_job(job_id)
+
+    thread = threading.Thread(target=run, name=f'import-job-{job_id}', daemon=True)
+    thread.start()
+    return thread
+
+
+def resume_import_jobs(app):
+    """Start threads for jobs that are waiting or were abandoned by a stopped process."""
+    job_ids = claimable_import_job_ids()
+    for job_id in job_ids:
+        logger.info(f"Resuming import job {job_id}")
+        start_import_thread(app, job_id)
+    return job_ids
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Worker process for background participant imports.
+Picks up queued import jobs and resumes jobs abandoned by a restarted worker.
+"""
+
+import sys
+import time
+from app import app
+from import_jobs import claimable_import_job_ids, process_import_job
+
+POLL_INTERVAL_SECONDS = 5
+
+
+def run_pending_jobs():
+    """Process every claimable import job once. Returns the number processed."""
+    processed = 0
+    with app.app_context():
+        for job_id in claimable_import_job_ids():
+            if process_import_job(job_id):
+                print(f"✅ Import job {job_id} processed")
+                processed += 1
+    return processed
+
+
+def main():
+    run_once = '--once' in sys.argv
+    print("🚀 Import worker started")
+
+    while True:
+        processed = run_pending_jobs()
+        if run_once:
+            print(f"🎉 Processed {processed} import job(s)")
+            break
+        if not processed:
+            time.sleep(POLL_INTERVAL_SECONDS)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+"""
+Live dashboard feed for the Event Ticketing System.
+Publishes small check-in and counter deltas to Server-Sent Events
+subscribers after each committed change, so open dashboards update without
+reloading the participant table.
+
+The broker only reaches streams served by the process that made the change.
+Idle streams also poll their event's counters version, so a change committed
+by another worker process reaches them as a resync message within
+POLL_SECONDS. The subscriber is not in this tree: event_dashboard.html has to
+open an EventSource on /event/<id>/live, apply checkin and counters messages,
+and reload the participant page on resync.
+"""
+
+import json
+import queue
+import logging
+import threading
+from sqlalchemy import event as sa_event, inspect
+from sqlalchemy.orm import Session
+from models import db, Participant, Certificate
+from event_stats import STAT_FIELDS, EventCounter
+
+logger = logging.getLogger(__name__)
+
+# Messages buffered per subscriber before it is considered too slow
+SUBSCRIBER_QUEUE_SIZE = 100
+
+# Seconds an idle stream waits before checking the counters version and sending a keep-alive
+POLL_SECONDS = 5
+
+
+class LiveFeedBroker:
+    """In-process fan-out of per-event messages to the subscriber queues of this process."""
+
+    def __init__(self):
+        self.subscribers = {}
+        self.lock = threading.Lock()
+
+    def subscribe(self, event_id):
+        subscriber = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self.lock:
+            self.subscribers.setdefault(event_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, event_id, subscriber):
+        with self.lock:
+            subscribers = self.subscribers.get(event_id)
+            if subscribers:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self.subscribers[event_id]
+
+    def has_subscribers(self, event_id):
+        with self.lock:
+            return bool(self.subscribers.get(event_id))
+
+    def publish(self, event_id, message):
+        """Deliver a message to every subscriber of an event."""
+        with self.lock:
+            subscribers = list(self.subscribers.get(event_id, ()))
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                # A stalled client gets a resync marker instead of an ever-growing backlog
+                logger.warning(f"Live feed subscriber for event {event_id} is lagging; asking it to resync")
+                with subscriber.mutex:
+                    subscriber.queue.clear()
+                subscriber.put_nowait({'type': 'resync'})
+
+
+broker = LiveFeedBroker()
+
+
+def counters_payload(stats):
+    """Keep the JSON-serializable counters and version of an event's stats."""
+    payload = {field: stats[field] for field in STAT_FIELDS}
+    payload['pending_emails'] = payload['total_participants'] - payload['emails_sent']
+    payload['version'] = stats['version']
+    return payload
+
+
+def load_counters(connection, event_ids):
+    """Read the maintained counters of several events on a connection."""
+    rows = connection.execute(
+        db.select(EventCounter.__table__).where(EventCounter.event_id.in_(list(event_ids)))
+    )
+    return {row.event_id: counters_payload(row._mapping) for row in rows}
+
+
+def queue_live_update(session, event_id, participant_id=None, checked_in=None, checkin_time=None):
+    """Queue a feed message for an event, sent once the session commits.
+
+    With a participant id the message is a check-in delta; without one it
+    only carries the refreshed counters. Write paths that update check-ins
+    with SQL statements instead of the ORM call this directly.
+    """
+    pending = session.info.setdefault('live_feed_pending', {})
+    updates = pending.setdefault(event_id, [])
+    if participant_id is not None:
+        updates.append({
+            'participant_id': participant_id,
+            'checked_in': bool(checked_in),
+            'checkin_time': checkin_time.isoformat() if checkin_time else None
+        })
+
+
+@sa_event.listens_for(Session, 'before_flush')
+def _collect_live_updates(session, flush_context, instances):
+    """Remember check-in changes and touched events of this transaction."""
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Participant):
+            participant = obj
+        elif isinstance(obj, Certificate):
+            participant = obj.participant or session.get(Participant, obj.participant_id)
+        else:
+            continue
+        if participant is None or participant.event_id is None:
+            continue
+
+        if obj is participant and obj in session.dirty and inspect(obj).attrs.checked_in.history.has_changes():
+            queue_live_update(session, participant.event_id, participant.id,
+                              participant.checked_in, participant.checkin_time)
+        else:
+            queue_live_update(session, participant.event_id)
+
+
+@sa_event.listens_for(Session, 'after_commit')
+def _publish_live_updates(session):
+    pending = session.info.pop('live_feed_pending', None)
+    if not pending:
+        return
+
+    event_ids = [event_id for event_id in pending if broker.has_subscribers(event_id)]
+    if not event_ids:
+        return
+
+    # The committed session cannot run SQL here, so read counters on a fresh connection
+    try:
+        with db.engine.connect() as connection:
+            counters = load_counters(connection, event_ids)
+    except Exception as e:
+        logger.error(f"Live feed could not load counters for events {event_ids}: {str(e)}")
+        counters = {}
+
+    for event_id in event_ids:
+        updates = pending[event_id]
+        for update in updates:
+            broker.publish(event_id, dict(update, type='checkin', counters=counters.get(event_id)))
+        if not updates:
+            broker.publish(event_id, {'type': 'counters', 'counters': counters.get(event_id)})
+
+
+@sa_event.listens_for(Session, 'after_rollback')
+def _discard_live_updates(session):
+    session.info.pop('live_feed_pending', None)
+
+
+def format_sse(message):
+    """Format a feed message as a Server-Sent Events frame."""
+    lines = [f"event: {message['type']}"]
+    counters = message.get('counters')
+    if counters:
+        lines.append(f"id: {counters['version']}")
+    lines.append(f"data: {json.dumps(message)}")
+    return '\n'.join(lines) + '\n\n'
+
+
+def _poll_counters(engine, event_id):
+    try:
+        with engine.connect() as connection:
+            return load_counters(connection, [event_id]).get(event_id)
+    except Exception as e:
+        logger.warning(f"Live feed could not poll counters for event {event_id}: {str(e)}")
+        return None
+
+
+def stream_event_feed(event_id, initial_counters, engine):
+    """Yield SSE frames for an event until the client disconnects.
+
+    The stream holds no database session; while idle it reads the event's
+    counters on a short-lived connection from engine.
+    """
+    subscriber = broker.subscribe(event_id)
+    version = initial_counters['version']
+    try:
+        yield format_sse({'type': 'counters', 'counters': initial_counters})
+        while True:
+            try:
+                message = subscriber.get(timeout=POLL_SECONDS)
+            except queue.Empty:
+                counters = _poll_counters(engine, event_id)
+                if counters and counters['version'] > version:
+                    # Committed by another process, so the individual check-ins are unknown here
+                    version = counters['version']
+                    yield format_sse({'type': 'resync', 'counters': counters})
+                else:
+                    yield ': keepalive\n\n'
+                continue
+            if message.get('counters'):
+                version = max(version, message['counters']['version'])
+            yield format_sse(message)
+    finally:
+        broker.unsubscribe(event_id, subscriber)
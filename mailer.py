@@ -0,0 +1,295 @@
+"""
+Batched email delivery for the Event Ticketing System.
+Sends every message of a batch over one authenticated SMTP connection,
+reconnecting only after a failure or when the server ends the session, so
+recipients do not each pay for a TCP connect, STARTTLS and login. An
+adaptive token bucket paces every send at the rate the provider tolerates.
+"""
+
+import time
+import smtplib
+import logging
+import threading
+from flask_mail import BadHeaderError
+
+logger = logging.getLogger(__name__)
+
+# Words in an SMTP reply meaning the account's sending quota or rate limit is exhausted
+QUOTA_REPLY_MARKERS = ['quota', 'rate limit', 'daily limit', 'sending limit', 'too many messages']
+
+
+class EmailQuotaExceeded(Exception):
+    """The SMTP server refused a message because a sending limit was reached."""
+
+
+# Rate limiter defaults, in messages per second; overridden by init_rate_limiter()
+MAIL_SEND_RATE = 5.0
+MAIL_SEND_MIN_RATE = 0.2
+MAIL_SEND_MAX_RATE = 20.0
+MAIL_SEND_BURST = 5
+
+# The rate is multiplied by the backoff factor on a 421 or quota reply and
+# by the increase factor after each streak of successful sends
+MAIL_SEND_BACKOFF_FACTOR = 0.5
+MAIL_SEND_INCREASE_FACTOR = 1.2
+MAIL_SEND_SUCCESS_STREAK = 20
+
+
+def smtp_error_codes(error):
+    """Get the SMTP reply codes carried by an smtplib exception."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return [code for code, _ in error.recipients.values()]
+    code = getattr(error, 'smtp_code', None)
+    return [code] if isinstance(code, int) and code > 0 else []
+
+
+def smtp_error_text(error):
+    """Get the text of the SMTP replies carried by an smtplib exception."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        replies = [message for _, message in error.recipients.values()]
+    else:
+        replies = [getattr(error, 'smtp_error', b'')]
+    return ' '.join(reply.decode('utf-8', 'replace') if isinstance(reply, bytes) else str(reply) for reply in replies)
+
+
+def is_quota_error(error):
+    """Whether the server refused the account, not one recipient, for exceeding a sending limit.
+
+    Refused recipients are always a verdict on their own address
+    (greylisting, a full or unknown mailbox), never on the account, and a
+    421 only ends the session.
+    """
+    if isinstance(error, smtplib.SMTPRecipientsRefused) or is_connection_throttle(error):
+        return False
+    if not smtp_error_codes(error):
+        return False
+    text = smtp_error_text(error).lower()
+    return any(marker in text for marker in QUOTA_REPLY_MARKERS)
+
+
+def is_connection_throttle(error):
+    """421 closes the session; the server is overloaded or limiting this client."""
+    return not isinstance(error, smtplib.SMTPRecipientsRefused) and 421 in smtp_error_codes(error)
+
+
+def is_permanent_error(error):
+    """5xx replies other than a quota are final; retrying the same message cannot succeed."""
+    codes = smtp_error_codes(error)
+    return bool(codes) and all(code >= 500 for code in codes) and not is_quota_error(error)
+
+
+def is_temporary_error(error):
+    """4xx replies (421, 450, 451, 452) ask the client to slow down and try again later."""
+    codes = smtp_error_codes(error)
+    return bool(codes) and all(400 <= code < 500 for code in codes)
+
+
+class AdaptiveRateLimiter:
+    """Thread-safe token bucket whose rate adapts to the SMTP server.
+
+    Every send takes a token; tokens refill at ``rate`` per second up to
+    ``burst``. A 421 or quota reply multiplies the rate by the backoff
+    factor, and every streak of successful sends raises it again by the
+    increase factor, bounded by min_rate and max_rate. The bucket is per
+    process, so the configured rate applies to each worker process.
+    """
+
+    def __init__(self, rate=MAIL_SEND_RATE, min_rate=MAIL_SEND_MIN_RATE, max_rate=MAIL_SEND_MAX_RATE,
+                 burst=MAIL_SEND_BURST):
+        self.lock = threading.Lock()
+        self.backoff_factor = MAIL_SEND_BACKOFF_FACTOR
+        self.increase_factor = MAIL_SEND_INCREASE_FACTOR
+        self.success_streak = MAIL_SEND_SUCCESS_STREAK
+        self.streak = 0
+        self.throttles = 0
+        self.configure(rate, min_rate, max_rate, burst)
+
+    def configure(self, rate, min_rate, max_rate, burst):
+        with self.lock:
+            self.min_rate = min_rate
+            self.max_rate = max(max_rate, min_rate)
+            self.rate = min(max(rate, self.min_rate), self.max_rate)
+            self.burst = max(burst, 1)
+            self.tokens = float(self.burst)
+            self.updated = time.monotonic()
+
+    @property
+    def current_rate(self):
+        with self.lock:
+            return self.rate
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Block until a send is allowed."""
+        while True:
+            with self.lock:
+                self._refill(time.monotonic())
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def record_success(self):
+        with self.lock:
+            self.streak += 1
+            if self.streak >= self.success_streak:
+                self.streak = 0
+                if self.rate < self.max_rate:
+                    self.rate = min(self.rate * self.increase_factor, self.max_rate)
+                    logger.info(f"Email sending rate raised to {self.rate:.2f}/s")
+
+    def record_throttle(self):
+        with self.lock:
+            self._refill(time.monotonic())
+            self.rate = max(self.rate * self.backoff_factor, self.min_rate)
+            self.tokens = min(self.tokens, 0.0)
+            self.streak = 0
+            self.throttles += 1
+            logger.warning(f"SMTP server is throttling, email sending rate lowered to {self.rate:.2f}/s")
+
+    def stats(self):
+        """Get the current rate, its bounds and how often the server throttled."""
+        with self.lock:
+            return {
+                'rate': round(self.rate, 3),
+                'min_rate': self.min_rate,
+                'max_rate': self.max_rate,
+                'burst': self.burst,
+                'success_streak': self.streak,
+                'throttles': self.throttles
+            }
+
+
+send_rate_limiter = AdaptiveRateLimiter()
+
+
+def init_rate_limiter(app):
+    """Configure the shared send rate limiter from the app's MAIL_SEND_* settings."""
+    send_rate_limiter.configure(
+        float(app.config.get('MAIL_SEND_RATE', MAIL_SEND_RATE)),
+        float(app.config.get('MAIL_SEND_MIN_RATE', MAIL_SEND_MIN_RATE)),
+        float(app.config.get('MAIL_SEND_MAX_RATE', MAIL_SEND_MAX_RATE)),
+        int(app.config.get('MAIL_SEND_BURST', MAIL_SEND_BURST))
+    )
+    return send_rate_limiter
+
+
+class BatchMailer:
+    """Reuse one Flask-Mail connection for all messages of a batch.
+
+    Use as a context manager; opening the connection doubles as the
+    connection test. Every attempt waits for the shared rate limiter.
+    Flask-Mail itself reconnects after MAIL_MAX_EMAILS messages. When the
+    server closes the session mid-batch (a 421 reply or a dropped
+    connection) the mailer reconnects and retries the message. Only a 421
+    or a quota reply slows the shared limiter down; a quota reply raises
+    EmailQuotaExceeded. Refused recipients and permanent 5xx replies fail
+    their own message at once and keep the connection open. Other 4xx
+    replies are retried at the limiter's pace, and dropped connections and
+    network errors with exponential backoff.
+    """
+
+    def __init__(self, mail, max_retries=3, limiter=None):
+        self.mail = mail
+        self.max_retries = max_retries
+        self.limiter = limiter or send_rate_limiter
+        self.connection = None
+        self.sent_on_connection = 0
+        self.connects = 0
+        self.sent = 0
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    def open(self):
+        """Connect and log in, unless a connection is already open."""
+        if self.connection is None:
+            connection = self.mail.connect()
+            connection.__enter__()
+            self.connection = connection
+            self.sent_on_connection = 0
+            self.connects += 1
+            logger.info(f"Opened SMTP connection #{self.connects} for batch send")
+        return self
+
+    def close(self):
+        connection, self.connection = self.connection, None
+        self.sent_on_connection = 0
+        if connection is not None:
+            try:
+                connection.__exit__(None, None, None)
+            except Exception as e:
+                # QUIT fails when the server already dropped the connection
+                logger.debug(f"Closing SMTP connection failed: {str(e)}")
+
+    def _session_ended(self, error):
+        if isinstance(error, smtplib.SMTPServerDisconnected):
+            return True
+        # A 421 after successful sends is the server's per-connection message limit
+        return (isinstance(error, smtplib.SMTPResponseException) and error.smtp_code == 421
+                and self.sent_on_connection > 0)
+
+    def send(self, msg):
+        """Send one message over the batch connection, reconnecting if needed."""
+        attempt = 0
+        while True:
+            attempt += 1
+            self.limiter.acquire()
+            try:
+                self.open()
+                self.connection.send(msg)
+                self.sent_on_connection += 1
+                self.sent += 1
+                self.limiter.record_success()
+                return
+
+            except (smtplib.SMTPAuthenticationError, BadHeaderError, AssertionError):
+                # Retrying cannot fix bad credentials or a malformed message
+                raise
+
+            except Exception as e:
+                if isinstance(e, smtplib.SMTPRecipientsRefused):
+                    # A verdict on this message's recipients; smtplib has reset the transaction
+                    raise
+
+                if is_quota_error(e):
+                    self.limiter.record_throttle()
+                    self.close()
+                    logger.error(f"🚫 Rate limit or quota exceeded for {', '.join(msg.recipients)}")
+                    raise EmailQuotaExceeded(f"Email quota/rate limit exceeded: {e}")
+
+                if is_permanent_error(e) or not isinstance(e, (smtplib.SMTPException, OSError)):
+                    # Retrying cannot change the server's verdict or fix the message;
+                    # smtplib has reset the transaction, so the connection stays usable
+                    raise
+
+                temporary = is_temporary_error(e)
+                sent_on_connection = self.sent_on_connection
+                session_ended = self._session_ended(e)
+                if not temporary or is_connection_throttle(e):
+                    # A 4xx other than 421 leaves the session usable
+                    self.close()
+                if session_ended and attempt < self.max_retries:
+                    logger.info(f"SMTP server ended the session after {sent_on_connection} messages, reconnecting")
+                    continue
+
+                logger.warning(f"Email send attempt {attempt} failed for {', '.join(msg.recipients)}: {str(e)}")
+                if is_connection_throttle(e):
+                    # The server is shedding load; slow every connection down
+                    self.limiter.record_throttle()
+                if attempt >= self.max_retries:
+                    raise
+                if temporary:
+                    # The limiter paces the retry
+                    continue
+
+                # Wait before retry
+                time.sleep(2 ** attempt)  # Exponential backoff
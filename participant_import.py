@@ -0,0 +1,218 @@
+"""
+Bulk participant import engine for the Event Ticketing System.
+Validates uploaded participant rows against the event in memory and writes
+them with chunked bulk inserts instead of one query per row.
+"""
+
+import csv
+import logging
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+from models import db, Participant
+from csv_stream import iter_csv_lines
+from ticketing import reserve_ticket_numbers
+from event_stats import adjust_event_counters
+from ticket_cache import queue_ticket_invalidation
+
+logger = logging.getLogger(__name__)
+
+# Number of participants written per bulk INSERT
+IMPORT_CHUNK_SIZE = 1000
+
+# Map common column variations to our expected names (with BOM-cleaned versions)
+NAME_COLUMNS = ['name', 'Name', 'NAME', 'participant_name', 'Participant Name', 'full_name', 'Full Name', '﻿name']
+EMAIL_COLUMNS = ['email', 'Email', 'EMAIL', 'email_address', 'Email Address', 'e-mail', 'E-mail']
+
+# Basic shape check of the dry-run validator; the importer accepts any non-blank email
+EMAIL_PATTERN = r'^[^@\s]+@[^@\s]+\.[^@\s]+$'
+
+
+def clean_fieldnames(fieldnames):
+    """Strip whitespace and BOM characters from detected column names."""
+    return [str(field).strip().lstrip('\ufeff').strip() if field is not None else '' for field in fieldnames]
+
+
+def read_participant_csv(stream):
+    """Build a DictReader that decodes a binary upload stream incrementally."""
+    csv_input = csv.DictReader(iter_csv_lines(stream))
+
+    # Clean fieldnames to remove any remaining invisible characters
+    if csv_input.fieldnames:
+        csv_input.fieldnames = clean_fieldnames(csv_input.fieldnames)
+
+    return csv_input
+
+
+class XlsxDictReader:
+    """Row-streaming reader over the first sheet of an .xlsx workbook.
+
+    Mirrors the parts of ``csv.DictReader`` the importer uses: a cleaned
+    ``fieldnames`` list from the header row and iteration over row dicts.
+    The workbook is opened in openpyxl read-only mode, so rows are parsed
+    from the sheet XML as they are consumed instead of loaded up front.
+    """
+
+    def __init__(self, stream):
+        self.workbook = load_workbook(stream, read_only=True, data_only=True)
+        self.rows = self.workbook.active.iter_rows(values_only=True)
+        header = next(self.rows, None) or ()
+        self.fieldnames = clean_fieldnames(header)
+
+    def __iter__(self):
+        try:
+            for values in self.rows:
+                # Skip blank rows like csv.DictReader does
+                if not any(value not in (None, '') for value in values):
+                    continue
+                yield dict(zip(self.fieldnames, values))
+        finally:
+            self.workbook.close()
+
+
+def is_xlsx_filename(filename):
+    """Check if an uploaded participant file is an Excel workbook."""
+    return filename.lower().endswith('.xlsx')
+
+
+def read_participant_file(stream, filename):
+    """Build a row reader for an uploaded participant CSV or .xlsx file."""
+    if is_xlsx_filename(filename):
+        return XlsxDictReader(stream)
+    return read_participant_csv(stream)
+
+
+def detect_participant_columns(fieldnames):
+    """Find which columns contain the participant name and email.
+
+    Returns a (name_col, email_col) tuple; either may be None when missing.
+    """
+    name_col = None
+    email_col = None
+
+    for col in fieldnames:
+        col_clean = col.strip().lstrip('\ufeff').strip()  # Extra BOM cleaning
+        if col_clean in NAME_COLUMNS or col in NAME_COLUMNS:
+            name_col = col
+        if col_clean in EMAIL_COLUMNS or col in EMAIL_COLUMNS:
+            email_col = col
+
+    return name_col, email_col
+
+
+def load_existing_emails(event_id):
+    """Load all registered emails of an event into a set with a single query."""
+    rows = db.session.query(Participant.email).filter(Participant.event_id == event_id)
+    return {email for (email,) in rows}
+
+
+def _insert_chunk(event, pending):
+    """Assign ticket numbers to pending rows and write them in one bulk INSERT."""
+    ticket_numbers = reserve_ticket_numbers(event, len(pending))
+    mappings = [
+        {
+            'event_id': event.id,
+            'name': name,
+            'email': email,
+            'ticket_number': ticket_number
+        }
+        for (name, email), ticket_number in zip(pending, ticket_numbers)
+    ]
+    db.session.execute(db.insert(Participant), mappings)
+
+    # Bulk INSERTs bypass the ORM flush hooks that maintain event counters and the ticket index
+    adjust_event_counters(event.id, total_participants=len(mappings))
+    queue_ticket_invalidation(db.session, event.id)
+    return len(mappings)
+
+
+def import_participants(event, rows, name_col, email_col, start_row=2, chunk_size=IMPORT_CHUNK_SIZE,
+                        known_emails=None):
+    """Import participant rows for an event using set-based validation.
+
+    ``rows`` is an iterable of dicts (a ``csv.DictReader`` or
+    ``XlsxDictReader``). Existing emails are loaded once, duplicates inside
+    the file are rejected, ticket numbers are reserved per chunk and rows are
+    written with bulk inserts. The caller is responsible for committing the
+    session. Callers importing one file in several calls pass the same
+    ``known_emails`` set (from ``load_existing_emails``) to every call; it
+    is updated with the emails imported.
+
+    Returns a (participants_added, errors) tuple matching the upload summary.
+    """
+    if known_emails is None:
+        known_emails = load_existing_emails(event.id)
+    participants_added = 0
+    errors = []
+    pending = []
+
+    for row_num, row in enumerate(rows, start=start_row):
+        try:
+            # Extract data from row using detected column names
+            name = str(row.get(name_col) or '').strip()
+            email = str(row.get(email_col) or '').strip()
+
+            if not name or not email:
+                errors.append(f"Row {row_num}: Missing name or email")
+                continue
+
+            # Reject emails already registered or seen earlier in this file
+            if email in known_emails:
+                errors.append(f"Row {row_num}: Email {email} already registered")
+                continue
+
+            known_emails.add(email)
+            pending.append((name, email))
+
+            if len(pending) >= chunk_size:
+                participants_added += _insert_chunk(event, pending)
+                pending = []
+
+        except Exception as e:
+            errors.append(f"Row {row_num}: {str(e)}")
+
+    if pending:
+        participants_added += _insert_chunk(event, pending)
+
+    logger.info(f"Bulk import for event {event.id}: {participants_added} added, {len(errors)} rejected")
+    return participants_added, errors
+
+
+def validate_participant_rows(event, rows, name_col, email_col, start_row=2):
+    """Dry-run validation of a whole participant file with pandas.
+
+    Checks every row at once for blank names or emails, malformed emails,
+    emails already registered for the event and duplicates within the file,
+    without writing anything. Malformed emails are only flagged here; the
+    importer still accepts them. Returns a (total_rows, report) tuple where
+    ``report`` is a DataFrame with one line per rejected row.
+    """
+    df = pd.DataFrame(((row.get(name_col), row.get(email_col)) for row in rows), columns=['name', 'email'])
+    df.index = pd.RangeIndex(start_row, start_row + len(df), name='row')
+
+    for column in ('name', 'email'):
+        df[column] = df[column].fillna('').astype(str).str.strip()
+
+    missing = (df['name'] == '') | (df['email'] == '')
+    invalid = ~missing & ~df['email'].str.match(EMAIL_PATTERN)
+    checkable = ~missing & ~invalid
+    registered = checkable & df['email'].isin(load_existing_emails(event.id))
+
+    # The first valid occurrence of an email is kept, like the importer does
+    candidates = df.loc[checkable & ~registered, 'email']
+    duplicate = pd.Series(False, index=df.index)
+    duplicate.loc[candidates.index] = candidates.duplicated(keep='first')
+    first_rows = candidates.reset_index().drop_duplicates('email').set_index('email')['row']
+    duplicate_of = 'Duplicate email in file (first seen in row ' + df['email'].map(first_rows).fillna(0).astype(int).astype(str) + ')'
+
+    df['error'] = np.select(
+        [missing, invalid, registered, duplicate],
+        ['Missing name or email', 'Invalid email address', 'Email already registered for this event', duplicate_of],
+        default=''
+    )
+
+    report = df[df['error'] != ''].reset_index()
+    report.columns = ['Row', 'Name', 'Email', 'Error']
+
+    logger.info(f"Dry run for event {event.id}: {len(df)} rows, {len(report)} rejected")
+    return len(df), report
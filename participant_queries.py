@@ -0,0 +1,202 @@
+"""
+Participant listing queries for the Event Ticketing System.
+Serves the dashboard table one page at a time with keyset (seek) pagination,
+so deep pages cost the same as the first one.
+"""
+
+import json
+import base64
+import logging
+from sqlalchemy.orm import joinedload, selectinload
+from models import db, Participant
+
+logger = logging.getLogger(__name__)
+
+# Page size limits for the participant list API
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Sortable columns; ties are broken by participant id
+SORT_COLUMNS = {
+    'id': Participant.id,
+    'name': Participant.name,
+    'email': Participant.email,
+    'ticket_number': Participant.ticket_number
+}
+
+# Composite indexes backing the filtered and sorted keyset scans
+PARTICIPANT_LIST_INDEXES = [
+    db.Index('ix_participants_event_id_id', Participant.event_id, Participant.id),
+    db.Index('ix_participants_event_name_id', Participant.event_id, Participant.name, Participant.id),
+    db.Index('ix_participants_event_email_id', Participant.event_id, Participant.email, Participant.id),
+    db.Index('ix_participants_event_ticket_id', Participant.event_id, Participant.ticket_number, Participant.id),
+    db.Index('ix_participants_event_checked_in_id', Participant.event_id, Participant.checked_in, Participant.id),
+    db.Index('ix_participants_event_email_sent_id', Participant.event_id, Participant.email_sent, Participant.id)
+]
+
+
+def ensure_participant_indexes():
+    """Create the participant list indexes on existing databases."""
+    bind = db.session.get_bind()
+    for index in PARTICIPANT_LIST_INDEXES:
+        index.create(bind=bind, checkfirst=True)
+
+
+def with_certificates(query, strategy='selectin'):
+    """Eager-load Participant.certificate for every row of a participant query.
+
+    ``selectin`` issues one extra IN query per page of results and suits
+    large collections; ``joined`` folds the certificate into the main query
+    with a LEFT OUTER JOIN and suits single rows or small pages.
+    """
+    if strategy == 'selectin':
+        return query.options(selectinload(Participant.certificate))
+    if strategy == 'joined':
+        return query.options(joinedload(Participant.certificate))
+    raise ValueError(f"Unsupported loading strategy: {strategy}")
+
+
+def event_participants(event_id, checked_in=None, strategy='selectin'):
+    """Get an event's participants with their certificates loaded up front."""
+    query = Participant.query.filter(Participant.event_id == event_id)
+    if checked_in is not None:
+        query = query.filter(Participant.checked_in == checked_in)
+    return with_certificates(query, strategy).order_by(Participant.id).all()
+
+
+def participants_by_ids(event_id, participant_ids, strategy='selectin', for_delete=False):
+    """Get selected participants of an event with certificates, in one query.
+
+    With ``for_delete`` the quiz sessions are loaded too: deleting a
+    participant detaches its quiz sessions, which would otherwise be
+    lazy-loaded one participant at a time during the flush.
+    """
+    ids = []
+    for participant_id in participant_ids:
+        try:
+            ids.append(int(participant_id))
+        except (TypeError, ValueError):
+            continue
+    if not ids:
+        return []
+
+    query = with_certificates(
+        Participant.query.filter(Participant.event_id == event_id, Participant.id.in_(ids)),
+        strategy
+    )
+    if for_delete:
+        query = query.options(selectinload(Participant.quiz_sessions))
+    return query.order_by(Participant.id).all()
+
+
+def encode_cursor(sort_value, participant_id):
+    """Encode the last row's sort key as an opaque page cursor."""
+    raw = json.dumps([sort_value, participant_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Decode a page cursor into (sort_value, participant_id)."""
+    try:
+        sort_value, participant_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return sort_value, int(participant_id)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+
+
+def parse_bool(value):
+    """Parse a true/false query string flag; None when absent or unrecognized."""
+    if value is None:
+        return None
+    value = value.strip().lower()
+    if value in ('1', 'true', 'yes', 'y'):
+        return True
+    if value in ('0', 'false', 'no', 'n'):
+        return False
+    return None
+
+
+def participant_to_dict(participant):
+    """Get a participant as a JSON-serializable dictionary."""
+    return {
+        'id': participant.id,
+        'name': participant.name,
+        'email': participant.email,
+        'ticket_number': participant.ticket_number,
+        'checked_in': participant.checked_in,
+        'checkin_time': participant.checkin_time.isoformat() if participant.checkin_time else None,
+        'email_sent': participant.email_sent,
+        'email_sent_at': participant.email_sent_at.isoformat() if participant.email_sent_at else None
+    }
+
+
+def filter_participants(query, search=None, checked_in=None, email_sent=None):
+    """Apply dashboard filters to a participant query."""
+    if search:
+        pattern = f"%{search.strip()}%"
+        query = query.filter(db.or_(
+            Participant.name.ilike(pattern),
+            Participant.email.ilike(pattern),
+            Participant.ticket_number.ilike(pattern)
+        ))
+    if checked_in is not None:
+        query = query.filter(Participant.checked_in == checked_in)
+    if email_sent is not None:
+        query = query.filter(Participant.email_sent == email_sent)
+    return query
+
+
+def list_participants(event_id, search=None, checked_in=None, email_sent=None,
+                      sort='id', direction='asc', cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """Get one page of an event's participants.
+
+    Pages are addressed by a cursor holding the last row's (sort value, id)
+    rather than an offset, so the database seeks straight to the page start.
+    Returns a dictionary with the participants, the next cursor and has_more.
+    """
+    if sort not in SORT_COLUMNS:
+        raise ValueError(f"Unsupported sort column: {sort}")
+    if direction not in ('asc', 'desc'):
+        raise ValueError(f"Unsupported sort direction: {direction}")
+
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    sort_column = SORT_COLUMNS[sort]
+
+    query = filter_participants(
+        with_certificates(Participant.query.filter(Participant.event_id == event_id)),
+        search=search, checked_in=checked_in, email_sent=email_sent
+    )
+
+    if cursor:
+        last_value, last_id = decode_cursor(cursor)
+        if direction == 'asc':
+            query = query.filter(db.or_(
+                sort_column > last_value,
+                db.and_(sort_column == last_value, Participant.id > last_id)
+            ))
+        else:
+            query = query.filter(db.or_(
+                sort_column < last_value,
+                db.and_(sort_column == last_value, Participant.id < last_id)
+            ))
+
+    if direction == 'asc':
+        query = query.order_by(sort_column.asc(), Participant.id.asc())
+    else:
+        query = query.order_by(sort_column.desc(), Participant.id.desc())
+
+    # Fetch one extra row to know whether another page exists
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    participants = rows[:limit]
+
+    next_cursor = None
+    if has_more:
+        last = participants[-1]
+        next_cursor = encode_cursor(getattr(last, sort_column.key), last.id)
+
+    return {
+        'participants': participants,
+        'next_cursor': next_cursor,
+        'has_more': has_more
+    }
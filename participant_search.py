@@ -0,0 +1,184 @@
+"""
+Fuzzy participant search for the Event Ticketing System.
+Looks participants up by partial or mistyped name, email or ticket number
+through a trigram index: pg_trgm on PostgreSQL and an FTS5 trigram table
+kept in sync by triggers on SQLite.
+"""
+
+import logging
+from sqlalchemy import text
+from models import db, Participant
+from participant_queries import filter_participants
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of ranked matches returned
+SEARCH_RESULT_LIMIT = 20
+
+# Fuzzy matching ignores trigrams found in more than this share of rows
+FUZZY_MAX_TRIGRAM_SHARE = 0.05
+
+# and uses at most this many of the rarest remaining trigrams
+FUZZY_MAX_TRIGRAMS = 12
+
+# Set by ensure_search_index() to 'pg_trgm', 'fts5' or None (substring fallback)
+search_backend = None
+
+PG_SEARCH_EXPRESSION = "(lower(name) || ' ' || lower(email) || ' ' || lower(ticket_number))"
+
+PG_SEARCH_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"CREATE INDEX IF NOT EXISTS ix_participants_search_trgm ON participants USING gin ({PG_SEARCH_EXPRESSION} gin_trgm_ops)"
+]
+
+SQLITE_SEARCH_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS participants_fts USING fts5(
+        event_id UNINDEXED, name, email, ticket_number,
+        content='participants', content_rowid='id', tokenize='trigram'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS participants_fts_ai AFTER INSERT ON participants BEGIN
+        INSERT INTO participants_fts(rowid, event_id, name, email, ticket_number)
+        VALUES (new.id, new.event_id, new.name, new.email, new.ticket_number);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS participants_fts_ad AFTER DELETE ON participants BEGIN
+        INSERT INTO participants_fts(participants_fts, rowid, event_id, name, email, ticket_number)
+        VALUES ('delete', old.id, old.event_id, old.name, old.email, old.ticket_number);
+    END""",
+    # Only searchable columns re-index a row, so check-ins do not touch the FTS table
+    """CREATE TRIGGER IF NOT EXISTS participants_fts_au AFTER UPDATE OF event_id, name, email, ticket_number ON participants BEGIN
+        INSERT INTO participants_fts(participants_fts, rowid, event_id, name, email, ticket_number)
+        VALUES ('delete', old.id, old.event_id, old.name, old.email, old.ticket_number);
+        INSERT INTO participants_fts(rowid, event_id, name, email, ticket_number)
+        VALUES (new.id, new.event_id, new.name, new.email, new.ticket_number);
+    END""",
+    # Per-trigram document counts, used to skip trigrams that match most rows
+    "CREATE VIRTUAL TABLE IF NOT EXISTS participants_fts_vocab USING fts5vocab(participants_fts, row)"
+]
+
+
+def ensure_search_index():
+    """Create the search index for the current database if it is missing."""
+    global search_backend
+    engine = db.engine
+    dialect_name = engine.dialect.name
+
+    try:
+        if dialect_name == 'postgresql':
+            with engine.begin() as connection:
+                for statement in PG_SEARCH_DDL:
+                    connection.execute(text(statement))
+            search_backend = 'pg_trgm'
+
+        elif dialect_name == 'sqlite':
+            with engine.begin() as connection:
+                exists = connection.execute(text(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'participants_fts'"
+                )).first()
+                for statement in SQLITE_SEARCH_DDL:
+                    connection.execute(text(statement))
+                if not exists:
+                    connection.execute(text("INSERT INTO participants_fts(participants_fts) VALUES ('rebuild')"))
+                    logger.info("Built FTS5 participant search index")
+            search_backend = 'fts5'
+
+    except Exception as e:
+        # pg_trgm needs privileges to install and FTS5 trigram needs SQLite 3.34+
+        logger.warning(f"Participant search index unavailable, using substring search: {str(e)}")
+        search_backend = None
+
+    return search_backend
+
+
+def search_trigrams(query):
+    """Split a search string into the distinct trigrams FTS5 matches on."""
+    query = query.lower()
+    seen = []
+    for i in range(len(query) - 2):
+        trigram = query[i:i + 3]
+        if trigram not in seen:
+            seen.append(trigram)
+    return seen
+
+
+def _search_pg_trgm(event_id, query, limit):
+    rows = db.session.execute(text(f"""
+        SELECT id, word_similarity(:query, {PG_SEARCH_EXPRESSION}) AS score
+        FROM participants
+        WHERE event_id = :event_id
+          AND ({PG_SEARCH_EXPRESSION} LIKE :pattern OR :query <% {PG_SEARCH_EXPRESSION})
+        ORDER BY score DESC, id
+        LIMIT :limit
+    """), {'query': query.lower(), 'pattern': f"%{query.lower()}%", 'event_id': event_id, 'limit': limit})
+    return [(row.id, float(row.score)) for row in rows]
+
+
+def _fts5_match(match, event_id, limit, exclude_ids=()):
+    rows = db.session.execute(text("""
+        SELECT rowid AS id, bm25(participants_fts) AS rank
+        FROM participants_fts
+        WHERE participants_fts MATCH :match AND event_id = :event_id
+        ORDER BY rank
+        LIMIT :limit
+    """), {'match': match, 'event_id': event_id, 'limit': limit + len(exclude_ids)})
+    return [(row.id, round(-row.rank, 4)) for row in rows if row.id not in exclude_ids][:limit]
+
+
+def _selective_trigrams(trigrams):
+    """Drop trigrams present in most rows (such as '.co' or 'gma'); rarest first."""
+    total = db.session.query(db.func.count(Participant.id)).scalar() or 0
+    placeholders = ', '.join(f':t{i}' for i in range(len(trigrams)))
+    counts = dict(db.session.execute(
+        text(f"SELECT term, doc FROM participants_fts_vocab WHERE term IN ({placeholders})"),
+        {f't{i}': trigram for i, trigram in enumerate(trigrams)}
+    ).all())
+    candidates = sorted((counts[t], t) for t in trigrams if t in counts and counts[t] <= max(total * FUZZY_MAX_TRIGRAM_SHARE, 1))
+    return [trigram for _, trigram in candidates[:FUZZY_MAX_TRIGRAMS]]
+
+
+def _quote_fts5(value):
+    return '"' + value.replace('"', '""') + '"'
+
+
+def _search_fts5(event_id, query, limit):
+    # Exact substring matches first: a quoted string matches all of its trigrams in order
+    ranked = _fts5_match(_quote_fts5(query.lower()), event_id, limit)
+    if len(ranked) >= limit:
+        return ranked
+
+    # Then fuzzy matches sharing any selective trigram; bm25 ranks rows sharing the most first
+    trigrams = _selective_trigrams(search_trigrams(query))
+    if trigrams:
+        found = {pid for pid, _ in ranked}
+        match = ' OR '.join(_quote_fts5(trigram) for trigram in trigrams)
+        ranked += _fts5_match(match, event_id, limit - len(ranked), exclude_ids=found)
+    return ranked
+
+
+def search_participants(event_id, query, limit=SEARCH_RESULT_LIMIT):
+    """Find an event's participants matching a partial or mistyped query.
+
+    Returns a list of (participant, score) tuples, best match first.
+    """
+    query = (query or '').strip()
+    if not query:
+        return []
+
+    # Trigram indexes need at least three characters; shorter input is a substring match
+    if search_backend == 'pg_trgm' and len(query) >= 3:
+        ranked = _search_pg_trgm(event_id, query, limit)
+    elif search_backend == 'fts5' and len(query) >= 3:
+        ranked = _search_fts5(event_id, query, limit)
+    else:
+        participants = filter_participants(
+            Participant.query.filter(Participant.event_id == event_id), search=query
+        ).order_by(Participant.name, Participant.id).limit(limit).all()
+        return [(participant, 1.0) for participant in participants]
+
+    if not ranked:
+        return []
+
+    participants = {
+        participant.id: participant
+        for participant in Participant.query.filter(Participant.id.in_([pid for pid, _ in ranked]))
+    }
+    return [(participants[pid], score) for pid, score in ranked if pid in participants]
@@ -0,0 +1,77 @@
+"""
+N+1 query guard for the Event Ticketing System.
+In test mode, counts the SELECT statements and ORM rows of every request and
+fails the request when it issues more queries per loaded row than allowed,
+which is the signature of a lazy load inside a loop.
+"""
+
+import logging
+from flask import g, has_request_context, request
+from sqlalchemy import event as sa_event
+from models import db
+
+logger = logging.getLogger(__name__)
+
+# Requests issuing at most this many queries are never flagged
+QUERY_GUARD_MIN_QUERIES = 10
+
+# Allowed SQL statements per ORM row loaded by a request
+QUERY_GUARD_MAX_QUERIES_PER_ROW = 0.5
+
+
+class NPlusOneError(AssertionError):
+    """Raised when a request issues too many queries for the rows it loads."""
+
+
+def _guard_active():
+    return has_request_context() and g.get('query_guard') is not None
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    # Only reads count; chunked bulk writes legitimately issue many statements
+    if _guard_active() and statement.lstrip()[:6].upper() == 'SELECT':
+        g.query_guard['queries'] += 1
+
+
+def _count_row(target, context):
+    if _guard_active():
+        g.query_guard['rows'] += 1
+
+
+def init_query_guard(app):
+    """Install the guard; it only runs when QUERY_GUARD_ENABLED (default: app.testing) is set."""
+    app.config.setdefault('QUERY_GUARD_MIN_QUERIES', QUERY_GUARD_MIN_QUERIES)
+    app.config.setdefault('QUERY_GUARD_MAX_QUERIES_PER_ROW', QUERY_GUARD_MAX_QUERIES_PER_ROW)
+
+    sa_event.listen(db.Model, 'load', _count_row, propagate=True)
+    listening_engines = set()
+
+    def enabled():
+        return app.config.get('QUERY_GUARD_ENABLED', app.testing)
+
+    @app.before_request
+    def start_query_guard():
+        if not enabled():
+            return
+        engine = db.engine
+        if engine not in listening_engines:
+            sa_event.listen(engine, 'before_cursor_execute', _count_query)
+            listening_engines.add(engine)
+        g.query_guard = {'queries': 0, 'rows': 0}
+
+    @app.after_request
+    def check_query_guard(response):
+        stats = g.pop('query_guard', None)
+        if stats is None:
+            return response
+
+        queries, rows = stats['queries'], stats['rows']
+        allowed = max(app.config['QUERY_GUARD_MIN_QUERIES'],
+                      app.config['QUERY_GUARD_MAX_QUERIES_PER_ROW'] * rows)
+        if queries > allowed:
+            message = (f"{request.method} {request.path} issued {queries} queries for {rows} loaded rows "
+                       f"(limit {allowed:g}); use an eager-loading helper from participant_queries")
+            logger.error(message)
+            raise NPlusOneError(message)
+
+        return response
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Event Counters Reconciliation Script
+Rebuild the per-event dashboard counters from the participants and
+certificates tables. Pass event ids to rebuild only those events.
+"""
+
+import sys
+from app import app
+from event_stats import rebuild_event_counters
+
+
+def main():
+    try:
+        event_ids = [int(arg) for arg in sys.argv[1:]] or None
+    except ValueError:
+        print("Usage: python rebuild_event_counters.py [event_id ...]")
+        sys.exit(1)
+
+    print("🔢 EVENT COUNTERS REBUILD")
+    print("=" * 50)
+
+    with app.app_context():
+        changed = rebuild_event_counters(event_ids)
+
+    if not changed:
+        print("✅ All event counters were already correct")
+        return
+
+    for event_id, (old, new) in changed.items():
+        if old is None:
+            print(f"➕ Event {event_id}: created {new}")
+        else:
+            drift = {field: new[field] - old[field] for field in new if new[field] != old[field]}
+            print(f"🔧 Event {event_id}: corrected {drift}")
+
+    print(f"🎉 Rebuilt counters for {len(changed)} event(s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+"""
+In-process ticket index for the Event Ticketing System.
+Keeps ticket number -> participant lookups of the events currently being
+scanned in memory, so unknown and wrong-event scans are answered without a
+query and known tickets need only their check-in UPDATE.
+"""
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+from sqlalchemy import event as sa_event, inspect
+from sqlalchemy.orm import Session
+from models import db, Event, Participant
+from ticketing import ticket_prefix
+
+logger = logging.getLogger(__name__)
+
+# Events whose ticket index is kept in memory at once
+TICKET_CACHE_MAX_EVENTS = 8
+
+# Seconds an index is trusted before it is reloaded, bounding staleness
+# from check-ins made by other processes
+TICKET_CACHE_TTL_SECONDS = 60
+
+# Participant columns whose change invalidates an event's index
+ROSTER_COLUMNS = ('event_id', 'ticket_number', 'name')
+
+
+class TicketEntry:
+    """Cached scan state of one ticket."""
+    __slots__ = ('participant_id', 'name', 'checked_in', 'checkin_time')
+
+    def __init__(self, participant_id, name, checked_in, checkin_time):
+        self.participant_id = participant_id
+        self.name = name
+        self.checked_in = bool(checked_in)
+        self.checkin_time = checkin_time
+
+
+class TicketIndexCache:
+    """Bounded LRU of per-event ticket indexes with hit/miss metrics."""
+
+    def __init__(self, max_events=TICKET_CACHE_MAX_EVENTS, ttl_seconds=TICKET_CACHE_TTL_SECONDS):
+        self.max_events = max_events
+        self.ttl_seconds = ttl_seconds
+        self.indexes = OrderedDict()
+        self.loading = {}  # event_id -> threading.Event set when its load finishes
+        self.prefixes = None  # (loaded at, {ticket prefix: event_id}) of every event
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.stale_reads = 0
+        self.invalidations = 0
+
+    def _load(self, event_id):
+        rows = db.session.execute(
+            db.select(Participant.ticket_number, Participant.id, Participant.name,
+                      Participant.checked_in, Participant.checkin_time)
+            .where(Participant.event_id == event_id)
+        )
+        return {row.ticket_number: TicketEntry(row.id, row.name, row.checked_in, row.checkin_time) for row in rows}
+
+    def _index(self, event_id):
+        """Get an event's index, loading it in one thread at a time.
+
+        While one thread reloads an expired index the others keep using the
+        previous one; without a previous index they wait for the load.
+        """
+        with self.lock:
+            cached = self.indexes.get(event_id)
+            if cached is not None and time.monotonic() - cached[0] < self.ttl_seconds:
+                self.indexes.move_to_end(event_id)
+                return cached[1]
+
+            loading = self.loading.get(event_id)
+            if loading is not None and cached is not None:
+                self.stale_reads += 1
+                return cached[1]
+            owner = loading is None
+            if owner:
+                loading = self.loading[event_id] = threading.Event()
+
+        if not owner:
+            loading.wait()
+            with self.lock:
+                cached = self.indexes.get(event_id)
+            # The load failed or was invalidated meanwhile; scans must not see an empty roster
+            return cached[1] if cached is not None else self._load(event_id)
+
+        try:
+            index = self._load(event_id)
+            with self.lock:
+                self.loads += 1
+                self.indexes[event_id] = (time.monotonic(), index)
+                self.indexes.move_to_end(event_id)
+                while len(self.indexes) > self.max_events:
+                    self.indexes.popitem(last=False)
+            logger.info(f"Loaded ticket index for event {event_id}: {len(index)} tickets")
+            return index
+        finally:
+            with self.lock:
+                self.loading.pop(event_id, None)
+            loading.set()
+
+    def lookup(self, event_id, ticket_number):
+        """Get the cached entry of a ticket in an event, or None when not indexed."""
+        entry = self._index(event_id).get(ticket_number)
+        with self.lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def ticket_event_id(self, ticket_number):
+        """Get the event whose ticket series a ticket number belongs to, or None."""
+        with self.lock:
+            cached = self.prefixes
+            if cached is not None and time.monotonic() - cached[0] < self.ttl_seconds:
+                return cached[1].get(ticket_number.rsplit('-', 1)[0])
+
+        rows = db.session.execute(db.select(Event.id, Event.alias_name, Event.date))
+        prefixes = {ticket_prefix(row): row.id for row in rows if row.alias_name and row.date}
+        with self.lock:
+            self.prefixes = (time.monotonic(), prefixes)
+        return prefixes.get(ticket_number.rsplit('-', 1)[0])
+
+    def remember(self, event_id, ticket_number, entry):
+        """Add a ticket found in the database to a loaded index."""
+        with self.lock:
+            cached = self.indexes.get(event_id)
+            if cached is not None:
+                cached[1][ticket_number] = entry
+
+    def update(self, event_id, ticket_number, checked_in, checkin_time):
+        """Record a committed check-in change in a loaded index."""
+        with self.lock:
+            cached = self.indexes.get(event_id)
+            entry = cached[1].get(ticket_number) if cached else None
+            if entry is not None:
+                entry.checked_in = bool(checked_in)
+                entry.checkin_time = checkin_time
+
+    def invalidate(self, event_id):
+        with self.lock:
+            if self.indexes.pop(event_id, None) is not None:
+                self.invalidations += 1
+
+    def invalidate_prefixes(self):
+        with self.lock:
+            self.prefixes = None
+
+    def stats(self):
+        """Get hit/miss metrics and the size of the cache."""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'loads': self.loads,
+                'stale_reads': self.stale_reads,
+                'invalidations': self.invalidations,
+                'events': {event_id: len(index) for event_id, (_, index) in self.indexes.items()}
+            }
+
+
+ticket_cache = TicketIndexCache()
+
+
+def _pending(session):
+    return session.info.setdefault('ticket_cache_pending', {'invalidate': set(), 'updates': [], 'prefixes': False})
+
+
+def queue_ticket_invalidation(session, event_id):
+    """Drop an event's ticket index once the session commits."""
+    _pending(session)['invalidate'].add(event_id)
+
+
+def queue_ticket_update(session, event_id, ticket_number, checked_in, checkin_time):
+    """Update a cached ticket's check-in state once the session commits."""
+    _pending(session)['updates'].append((event_id, ticket_number, checked_in, checkin_time))
+
+
+@sa_event.listens_for(Session, 'before_flush')
+def _collect_ticket_changes(session, flush_context, instances):
+    # Created, renamed, redated or deleted events change the ticket series map
+    if any(isinstance(obj, Event) for obj in list(session.new) + list(session.dirty) + list(session.deleted)):
+        _pending(session)['prefixes'] = True
+
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, Participant) and obj.event_id:
+            queue_ticket_invalidation(session, obj.event_id)
+
+    for obj in session.dirty:
+        if not isinstance(obj, Participant):
+            continue
+        attrs = inspect(obj).attrs
+        if any(attrs[column].history.has_changes() for column in ROSTER_COLUMNS):
+            queue_ticket_invalidation(session, obj.event_id)
+            for previous_event_id in attrs.event_id.history.deleted:
+                queue_ticket_invalidation(session, previous_event_id)
+        elif attrs.checked_in.history.has_changes() or attrs.checkin_time.history.has_changes():
+            queue_ticket_update(session, obj.event_id, obj.ticket_number, obj.checked_in, obj.checkin_time)
+
+
+@sa_event.listens_for(Session, 'after_commit')
+def _apply_ticket_changes(session):
+    pending = session.info.pop('ticket_cache_pending', None)
+    if not pending:
+        return
+    if pending['prefixes']:
+        ticket_cache.invalidate_prefixes()
+    for event_id in pending['invalidate']:
+        ticket_cache.invalidate(event_id)
+    for event_id, ticket_number, checked_in, checkin_time in pending['updates']:
+        if event_id not in pending['invalidate']:
+            ticket_cache.update(event_id, ticket_number, checked_in, checkin_time)
+
+
+@sa_event.listens_for(Session, 'after_rollback')
+def _discard_ticket_changes(session):
+    session.info.pop('ticket_cache_pending', None)
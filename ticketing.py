@@ -0,0 +1,91 @@
+"""
+Ticket number allocation for the Event Ticketing System.
+Reserves contiguous blocks of ticket numbers from a per-event counter row so
+callers never have to scan the participants table per ticket.
+"""
+
+from datetime import datetime
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db
+
+
+class TicketCounter(db.Model):
+    """Per-event counter holding the last reserved ticket number."""
+    __tablename__ = 'ticket_counters'
+
+    event_id = db.Column(db.Integer, db.ForeignKey('events.id'), primary_key=True)
+    last_number = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<TicketCounter event={self.event_id} last={self.last_number}>'
+
+
+def ticket_prefix(event):
+    """Build the ticket prefix used by the event's ticket format."""
+    return f"{event.alias_name.upper()}-{event.date.strftime('%m')}-{event.date.strftime('%Y')}"
+
+
+def _dialect():
+    return db.session.get_bind().dialect
+
+
+def _seed_counter(event):
+    """Create the counter row for an event from its current highest ticket number."""
+    next_ticket = event.generate_next_ticket_number()
+    last_number = int(next_ticket.rsplit('-', 1)[1]) - 1
+
+    values = {'event_id': event.id, 'last_number': last_number, 'updated_at': datetime.utcnow()}
+    dialect_name = _dialect().name
+
+    # Another worker may seed the same event concurrently; the first row wins
+    if dialect_name == 'postgresql':
+        stmt = postgresql.insert(TicketCounter).values(**values).on_conflict_do_nothing()
+    elif dialect_name == 'sqlite':
+        stmt = sqlite.insert(TicketCounter).values(**values).on_conflict_do_nothing()
+    else:
+        stmt = db.insert(TicketCounter).values(**values)
+
+    db.session.execute(stmt)
+
+
+def _increment_counter(event_id, count):
+    """Atomically advance the counter and return the new last number (or None)."""
+    stmt = (
+        db.update(TicketCounter)
+        .where(TicketCounter.event_id == event_id)
+        .values(last_number=TicketCounter.last_number + count, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+
+    if _dialect().update_returning:
+        return db.session.execute(stmt.returning(TicketCounter.last_number)).scalar()
+
+    # Fallback for databases without UPDATE ... RETURNING: the UPDATE holds the
+    # row lock for the rest of the transaction, so the follow-up read is safe.
+    result = db.session.execute(stmt)
+    if result.rowcount == 0:
+        return None
+    return db.session.execute(
+        db.select(TicketCounter.last_number).where(TicketCounter.event_id == event_id)
+    ).scalar()
+
+
+def reserve_ticket_numbers(event, count=1):
+    """Reserve ``count`` unique, contiguous ticket numbers for an event.
+
+    The reservation is a single UPDATE on the event's counter row and is part
+    of the caller's transaction. Numbers reserved by a rolled back transaction
+    are released with it.
+    """
+    if count <= 0:
+        return []
+
+    last_number = _increment_counter(event.id, count)
+    if last_number is None:
+        _seed_counter(event)
+        last_number = _increment_counter(event.id, count)
+
+    first_number = last_number - count + 1
+    prefix = ticket_prefix(event)
+    return [f"{prefix}-{number:03d}" for number in range(first_number, last_number + 1)]